@@ -112,6 +112,12 @@ class AnalyticsRefreshScheduler:
             self._last_completed_at = timestamp.astimezone(timezone.utc)
             return result
 
+    @property
+    def refresh_pending(self) -> bool:
+        """Whether a refresh is waiting out its debounce window or running."""
+
+        return self._debounce_handle is not None or bool(self._task and not self._task.done())
+
     @property
     def last_completed_at(self) -> Optional[datetime]:
         """UTC timestamp of the most recent successful generation."""
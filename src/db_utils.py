@@ -10,11 +10,10 @@ from __future__ import annotations
 from typing import Any
 
 from sqlalchemy import Engine, event
-from sqlalchemy.engine import Connection
 from sqlmodel import create_engine
 
 
-def configure_sqlite_pragmas(connection: Connection, _: Any) -> None:
+def configure_sqlite_pragmas(dbapi_connection: Any, _: Any) -> None:
     """Configure SQLite pragmas for production use.
 
     This function is designed to be used as a SQLAlchemy event listener
@@ -26,10 +25,10 @@ def configure_sqlite_pragmas(connection: Connection, _: Any) -> None:
     - 5-second busy timeout to handle concurrent writes
 
     Args:
-        connection: SQLAlchemy connection object
+        dbapi_connection: Raw DBAPI (sqlite3) connection passed to "connect" listeners
         _: Connection record (unused)
     """
-    cursor = connection.connection.cursor()
+    cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode = WAL")
     cursor.execute("PRAGMA synchronous = NORMAL")
     cursor.execute("PRAGMA foreign_keys = ON")
@@ -41,6 +40,7 @@ def create_hardened_sqlite_engine(
     database_url: str,
     echo: bool = False,
     connect_args: dict[str, Any] | None = None,
+    **engine_kwargs: Any,
 ) -> Engine:
     """Create a SQLite engine with production-hardening pragmas applied.
 
@@ -55,6 +55,7 @@ def create_hardened_sqlite_engine(
         database_url: SQLAlchemy database URL (e.g., "sqlite:///data/mydb.db")
         echo: Whether to log SQL statements (default: False)
         connect_args: Additional connection arguments to pass to create_engine
+        **engine_kwargs: Extra keyword arguments for create_engine, e.g. pool sizing
 
     Returns:
         Configured SQLAlchemy Engine with pragmas applied on each connection
@@ -72,6 +73,7 @@ def create_hardened_sqlite_engine(
         database_url,
         echo=echo,
         connect_args=default_connect_args,
+        **engine_kwargs,
     )
 
     # Register the pragma configuration to run on every new connection
@@ -110,8 +112,12 @@ def run_migrations_for_engine(engine: Engine, migrations_dir: Any) -> None:
             with engine.begin() as conn:
                 # Execute each statement separately
                 for statement in sql.split(";"):
-                    statement = statement.strip()
-                    if statement and not statement.startswith("--"):
+                    # Drop comment lines so a statement preceded by a comment
+                    # still runs
+                    statement = "\n".join(
+                        line for line in statement.splitlines() if not line.lstrip().startswith("--")
+                    ).strip()
+                    if statement:
                         conn.exec_driver_sql(statement)
         except Exception:
             # Migrations are idempotent (CREATE INDEX IF NOT EXISTS),
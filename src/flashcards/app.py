@@ -10,6 +10,7 @@ from fastapi import Depends, FastAPI, HTTPException, Header, status
 from users.auth import decode_access_token
 
 from .models import (
+    CardBulkCreate,
     CardCreate,
     CardResponse,
     CardUpdate,
@@ -17,6 +18,7 @@ from .models import (
     DeckResponse,
     DeckStatsResponse,
     DeckUpdate,
+    FlashcardDB,
     ReviewResponse,
     ReviewSubmit,
 )
@@ -52,6 +54,22 @@ def get_current_user_id(authorization: str = Header(..., alias="Authorization"))
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 
+def _to_card_response(card: FlashcardDB) -> CardResponse:
+    """Build the API response for a stored card, decoding its JSON tags."""
+    return CardResponse(
+        id=card.id,
+        deck_id=card.deck_id,
+        front=card.front,
+        back=card.back,
+        hint=card.hint,
+        tags=json.loads(card.tags),
+        source_question_id=card.source_question_id,
+        difficulty=card.difficulty,
+        created_at=card.created_at,
+        updated_at=card.updated_at,
+    )
+
+
 def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
     """Create and configure the flashcard FastAPI application.
 
@@ -273,19 +291,29 @@ def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
             source_question_id=payload.source_question_id,
         )
 
-        return CardResponse(
-            id=card.id,
-            deck_id=card.deck_id,
-            front=card.front,
-            back=card.back,
-            hint=card.hint,
-            tags=json.loads(card.tags),
-            source_question_id=card.source_question_id,
-            difficulty=card.difficulty,
-            created_at=card.created_at,
-            updated_at=card.updated_at,
+        return _to_card_response(card)
+
+    @app.post("/cards/bulk", response_model=list[CardResponse], status_code=status.HTTP_201_CREATED)
+    def create_cards_bulk(
+        payload: CardBulkCreate,
+        store: FlashcardStore = Depends(get_store),
+    ) -> list[CardResponse]:
+        """Create several flashcards in one deck in a single transaction."""
+        # Verify deck exists
+        deck = store.get_deck(payload.deck_id)
+        if not deck:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Deck {payload.deck_id} not found",
+            )
+
+        cards = store.create_cards_bulk(
+            payload.deck_id,
+            [card.model_dump() for card in payload.cards],
         )
 
+        return [_to_card_response(card) for card in cards]
+
     @app.get("/decks/{deck_id}/cards", response_model=list[CardResponse])
     def list_cards(
         deck_id: int,
@@ -302,21 +330,7 @@ def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
 
         cards = store.list_cards(deck_id)
 
-        return [
-            CardResponse(
-                id=card.id,
-                deck_id=card.deck_id,
-                front=card.front,
-                back=card.back,
-                hint=card.hint,
-                tags=json.loads(card.tags),
-                source_question_id=card.source_question_id,
-                difficulty=card.difficulty,
-                created_at=card.created_at,
-                updated_at=card.updated_at,
-            )
-            for card in cards
-        ]
+        return [_to_card_response(card) for card in cards]
 
     @app.get("/cards/{card_id}", response_model=CardResponse)
     def get_card(
@@ -331,18 +345,7 @@ def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
                 detail=f"Card {card_id} not found",
             )
 
-        return CardResponse(
-            id=card.id,
-            deck_id=card.deck_id,
-            front=card.front,
-            back=card.back,
-            hint=card.hint,
-            tags=json.loads(card.tags),
-            source_question_id=card.source_question_id,
-            difficulty=card.difficulty,
-            created_at=card.created_at,
-            updated_at=card.updated_at,
-        )
+        return _to_card_response(card)
 
     @app.patch("/cards/{card_id}", response_model=CardResponse)
     def update_card(
@@ -365,18 +368,7 @@ def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
                 detail=f"Card {card_id} not found",
             )
 
-        return CardResponse(
-            id=card.id,
-            deck_id=card.deck_id,
-            front=card.front,
-            back=card.back,
-            hint=card.hint,
-            tags=json.loads(card.tags),
-            source_question_id=card.source_question_id,
-            difficulty=card.difficulty,
-            created_at=card.created_at,
-            updated_at=card.updated_at,
-        )
+        return _to_card_response(card)
 
     @app.delete("/cards/{card_id}", status_code=status.HTTP_204_NO_CONTENT)
     def delete_card(
@@ -411,21 +403,7 @@ def create_app(*, store: Optional[FlashcardStore] = None) -> FastAPI:
 
         due_cards = store.get_due_cards(deck_id, user_id, limit)
 
-        return [
-            CardResponse(
-                id=card.id,
-                deck_id=card.deck_id,
-                front=card.front,
-                back=card.back,
-                hint=card.hint,
-                tags=json.loads(card.tags),
-                source_question_id=card.source_question_id,
-                difficulty=card.difficulty,
-                created_at=card.created_at,
-                updated_at=card.updated_at,
-            )
-            for card, _ in due_cards
-        ]
+        return [_to_card_response(card) for card, _ in due_cards]
 
     @app.post("/reviews", response_model=ReviewResponse)
     def submit_review(
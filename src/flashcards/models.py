@@ -171,6 +171,23 @@ class CardCreate(BaseModel):
     source_question_id: Optional[str] = None
 
 
+class CardContent(BaseModel):
+    """Content of one flashcard in a bulk create request."""
+
+    front: str = Field(min_length=1)
+    back: str = Field(min_length=1)
+    hint: Optional[str] = None
+    tags: list[str] = Field(default_factory=list)
+    source_question_id: Optional[str] = None
+
+
+class CardBulkCreate(BaseModel):
+    """Request payload for creating several flashcards in one deck."""
+
+    deck_id: int
+    cards: list[CardContent] = Field(min_length=1)
+
+
 class CardUpdate(BaseModel):
     """Request payload for updating a flashcard."""
 
@@ -7,7 +7,8 @@ from datetime import date, datetime, timezone
 from pathlib import Path
 from typing import Optional
 
-from sqlmodel import Session, SQLModel, select, func
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, delete, select, func
 
 from db_utils import create_hardened_sqlite_engine, run_migrations_for_engine
 from .models import CardReviewDB, DeckDB, FlashcardDB
@@ -104,7 +105,6 @@ class FlashcardStore:
 
             deck.updated_at = datetime.now(timezone.utc)
 
-            session.add(deck)
             session.commit()
             session.refresh(deck)
             return deck
@@ -116,20 +116,12 @@ class FlashcardStore:
             if not deck:
                 return False
 
-            # Delete all cards in the deck
-            cards = session.exec(select(FlashcardDB).where(FlashcardDB.deck_id == deck_id)).all()
-            for card in cards:
-                # Delete card reviews
-                reviews = session.exec(
-                    select(CardReviewDB).where(CardReviewDB.card_id == card.id)
-                ).all()
-                for review in reviews:
-                    session.delete(review)
-                # Delete card
-                session.delete(card)
-
-            # Delete deck
-            session.delete(deck)
+            # Children first: foreign keys are enforced, and the ORM does not
+            # order deletes across these unrelated mappers
+            card_ids = select(FlashcardDB.id).where(FlashcardDB.deck_id == deck_id)
+            session.exec(delete(CardReviewDB).where(CardReviewDB.card_id.in_(card_ids)))
+            session.exec(delete(FlashcardDB).where(FlashcardDB.deck_id == deck_id))
+            session.exec(delete(DeckDB).where(DeckDB.id == deck_id))
             session.commit()
             return True
 
@@ -159,6 +151,43 @@ class FlashcardStore:
             session.refresh(card)
             return card
 
+    def create_cards_bulk(self, deck_id: int, cards: list[dict]) -> list[FlashcardDB]:
+        """Create several flashcards in one deck with a single INSERT.
+
+        All rows are written by one multi-row ``INSERT ... RETURNING`` and
+        committed together, instead of one insert and commit per card.
+
+        Args:
+            deck_id: Deck to add the cards to
+            cards: Card fields as accepted by :meth:`create_card`
+                (``front``, ``back`` and optionally ``hint``, ``tags``,
+                ``source_question_id``)
+
+        Returns:
+            Created cards, in the order given
+        """
+        if not cards:
+            return []
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "deck_id": deck_id,
+                "front": card["front"],
+                "back": card["back"],
+                "hint": card.get("hint"),
+                "tags": json.dumps(card.get("tags") or []),
+                "source_question_id": card.get("source_question_id"),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for card in cards
+        ]
+        statement = insert(FlashcardDB).returning(FlashcardDB, sort_by_parameter_order=True)
+        with Session(self.engine, expire_on_commit=False) as session:
+            created = list(session.scalars(statement, rows))
+            session.commit()
+            return created
+
     def get_card(self, card_id: int) -> Optional[FlashcardDB]:
         """Retrieve a card by ID."""
         with Session(self.engine) as session:
@@ -196,7 +225,6 @@ class FlashcardStore:
 
             card.updated_at = datetime.now(timezone.utc)
 
-            session.add(card)
             session.commit()
             session.refresh(card)
             return card
@@ -208,13 +236,9 @@ class FlashcardStore:
             if not card:
                 return False
 
-            # Delete reviews
-            reviews = session.exec(select(CardReviewDB).where(CardReviewDB.card_id == card_id)).all()
-            for review in reviews:
-                session.delete(review)
-
-            # Delete card
-            session.delete(card)
+            # Reviews before the card they reference
+            session.exec(delete(CardReviewDB).where(CardReviewDB.card_id == card_id))
+            session.exec(delete(FlashcardDB).where(FlashcardDB.id == card_id))
             session.commit()
             return True
 
@@ -5,7 +5,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional
 
-from sqlmodel import Session, SQLModel, select
+from sqlmodel import Session, SQLModel, delete, select
 
 from db_utils import create_hardened_sqlite_engine
 from .db_models import StudyPlanDB, StudyPlanTaskDB
@@ -147,15 +147,10 @@ class StudyPlanStore:
             if not plan_db:
                 return False
 
-            # Delete tasks first (foreign key constraint)
-            tasks_db = session.exec(
-                select(StudyPlanTaskDB).where(StudyPlanTaskDB.plan_id == plan_id)
-            ).all()
-            for task_db in tasks_db:
-                session.delete(task_db)
-
-            # Delete plan
-            session.delete(plan_db)
+            # Delete tasks first (foreign key constraint). Bulk DELETEs run in
+            # the order issued; a single flush would not order these mappers.
+            session.exec(delete(StudyPlanTaskDB).where(StudyPlanTaskDB.plan_id == plan_id))
+            session.exec(delete(StudyPlanDB).where(StudyPlanDB.plan_id == plan_id))
             session.commit()
 
             return True
@@ -12,6 +12,7 @@ from threading import Lock
 from typing import Awaitable, Callable, Iterable, Optional
 
 from sqlalchemy import Column, DateTime
+from sqlalchemy.pool import StaticPool
 from sqlmodel import Field, Session, SQLModel, select
 
 from db_utils import create_hardened_sqlite_engine
@@ -91,9 +92,16 @@ class ReviewStore:
         self._analytics = _AnalyticsDispatcher(analytics_hook)
         self._audit_log_path = Path(audit_log_path) if audit_log_path else Path("data/reviews/audit.log")
         self._audit_log_path.parent.mkdir(parents=True, exist_ok=True)
+        database_url = self._database_url()
+        engine_kwargs = {"pool_pre_ping": True}
+        if database_url == "sqlite:///:memory:":
+            # Every pooled connection to :memory: would open its own empty
+            # database; share one so all threads see the same tables.
+            engine_kwargs = {"poolclass": StaticPool}
         self._engine = create_hardened_sqlite_engine(
-            self._database_url(),
-            connect_args={"check_same_thread": False, "pool_pre_ping": True},
+            database_url,
+            connect_args={"check_same_thread": False},
+            **engine_kwargs,
         )
         self._initialise()
 
@@ -2,17 +2,28 @@
 
 from __future__ import annotations
 
-from typing import Optional
-
-from fastapi import Depends, FastAPI, HTTPException, status
+import asyncio
+import hashlib
+from functools import partial
+from typing import AsyncIterator, Optional
+
+import jwt
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlmodel import Session
 
 from .auth import (
+    ACCESS_TOKEN_EXPIRES,
+    ACCESS_TOKEN_EXPIRES_IN,
     create_access_token,
+    create_refresh_token,
     create_token_pair,
     decode_refresh_token,
+    get_user_id_from_claims,
     get_user_id_from_token,
     JWT_EXPIRATION_HOURS,
+    password_executor,
 )
 from .models import (
     RefreshTokenRequest,
@@ -27,6 +38,22 @@ from .store import UserStore
 
 security = HTTPBearer()
 
+# Profiles change rarely; let the client's private cache revalidate briefly
+PROFILE_CACHE_CONTROL = "private, max-age=30"
+
+
+def _profile_etag(profile: UserProfile) -> str:
+    """Compute a weak ETag from the serialized profile.
+
+    Args:
+        profile: Profile about to be returned
+
+    Returns:
+        Weak entity tag that changes whenever any profile field changes
+    """
+    digest = hashlib.blake2b(profile.model_dump_json().encode("utf-8"), digest_size=16)
+    return f'W/"{digest.hexdigest()}"'
+
 
 def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
     """Create and configure the user authentication FastAPI application.
@@ -47,15 +74,38 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         """Dependency to get the user store instance."""
         return app.state.user_store
 
+    async def get_session(store: UserStore = Depends(get_store)) -> AsyncIterator[Session]:
+        """Dependency yielding one database session for the whole request.
+
+        FastAPI caches dependencies per request, so every store call made by
+        a handler and its dependencies shares this session's connection.
+        The dependency is async so it runs on the event loop rather than in
+        the threadpool: creating a session does not check out a connection,
+        so requests that never reach the database (such as user cache hits)
+        never touch the pool or leave the loop.
+        """
+        session = store.session()
+        try:
+            yield session
+        finally:
+            # Only a session still holding a connection has rollback work to
+            # do on close; run that in the threadpool
+            if session.in_transaction():
+                await run_in_threadpool(session.close)
+            else:
+                session.close()
+
     async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         store: UserStore = Depends(get_store),
+        session: Session = Depends(get_session),
     ) -> User:
         """Dependency to get the current authenticated user from JWT token.
 
         Args:
             credentials: HTTP Bearer token credentials
             store: User store instance
+            session: Request-scoped database session
 
         Returns:
             Authenticated user object
@@ -73,7 +123,11 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        user = store.get_user_by_id(user_id)
+        # Cache hits are served on the event loop; misses go to the database
+        # in the threadpool
+        user = store.get_cached_user(user_id)
+        if user is None:
+            user = await run_in_threadpool(store.get_user_by_id, user_id, session=session)
         if user is None or not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -86,7 +140,7 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
     # --- PUBLIC ENDPOINTS ---
 
     @app.post("/auth/register", response_model=UserProfile, status_code=status.HTTP_201_CREATED)
-    def register(user_data: UserCreate, store: UserStore = Depends(get_store)) -> UserProfile:
+    async def register(user_data: UserCreate, store: UserStore = Depends(get_store)) -> UserProfile:
         """Register a new user account.
 
         Args:
@@ -99,34 +153,30 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         Raises:
             HTTPException: If email already exists or validation fails
         """
+        # Hashing the new password is CPU-bound; keep it off the event loop
+        loop = asyncio.get_running_loop()
         try:
-            user = store.create_user(user_data)
+            user = await loop.run_in_executor(password_executor, store.create_user, user_data)
         except ValueError as exc:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(exc),
             ) from exc
 
-        return UserProfile(
-            id=user.id,
-            email=user.email,
-            full_name=user.full_name,
-            exam_date=user.exam_date,
-            subscription_tier=user.subscription_tier,
-            subscription_start=user.subscription_start,
-            subscription_end=user.subscription_end,
-            created_at=user.created_at,
-            last_login=user.last_login,
-            is_active=user.is_active,
-        )
+        return UserProfile.from_user(user)
 
     @app.post("/auth/login", response_model=TokenResponse)
-    def login(credentials: UserLogin, store: UserStore = Depends(get_store)) -> TokenResponse:
+    async def login(
+        credentials: UserLogin,
+        store: UserStore = Depends(get_store),
+        session: Session = Depends(get_session),
+    ) -> TokenResponse:
         """Authenticate a user and return access and refresh tokens.
 
         Args:
             credentials: User login credentials
             store: User store instance
+            session: Request-scoped database session
 
         Returns:
             JWT token pair (access + refresh tokens)
@@ -134,7 +184,12 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         Raises:
             HTTPException: If authentication fails
         """
-        user = store.authenticate(credentials.email, credentials.password)
+        # Password verification is CPU-bound; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(
+            password_executor,
+            partial(store.authenticate, credentials.email, credentials.password, session=session),
+        )
 
         if user is None:
             raise HTTPException(
@@ -147,10 +202,12 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         token_data = create_token_pair(user.id, user.email)
 
         # Store refresh token in database
-        store.store_refresh_token(
+        await run_in_threadpool(
+            store.store_refresh_token,
             user_id=user.id,
             token=token_data["refresh_token"],
             expires_at=token_data["refresh_expires_at"],
+            session=session,
         )
 
         return TokenResponse(
@@ -161,7 +218,7 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         )
 
     @app.post("/auth/refresh", response_model=TokenResponse)
-    def refresh_token(
+    async def refresh_token(
         refresh_request: RefreshTokenRequest,
         store: UserStore = Depends(get_store),
     ) -> TokenResponse:
@@ -177,87 +234,88 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
         Raises:
             HTTPException: If refresh token is invalid or expired
         """
-        import jwt
-
         try:
-            # Decode and validate refresh token
+            # Decode and validate refresh token (the only parse of this token)
             payload = decode_refresh_token(refresh_request.refresh_token)
-            user_id = int(payload.get("sub"))
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError, ValueError) as exc:
+            user_id = get_user_id_from_claims(payload)
+            if user_id is None:
+                raise jwt.InvalidTokenError("Token does not identify a user")
+        except jwt.InvalidTokenError as exc:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired refresh token",
                 headers={"WWW-Authenticate": "Bearer"},
             ) from exc
 
-        # Check if token exists in database and is not revoked
-        db_token = store.get_refresh_token(refresh_request.refresh_token)
-        if db_token is None:
+        # Revoke the old token, store its replacement, and load the user in
+        # a single transaction
+        new_refresh_token, refresh_expires_at = create_refresh_token(user_id)
+        user = await run_in_threadpool(
+            store.rotate_refresh_token,
+            old_token=refresh_request.refresh_token,
+            new_token=new_refresh_token,
+            user_id=user_id,
+            expires_at=refresh_expires_at,
+        )
+        if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Refresh token not found or has been revoked",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Get user from database
-        user = store.get_user_by_id(user_id)
-        if user is None or not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found or inactive",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        # Revoke old refresh token
-        store.revoke_refresh_token(refresh_request.refresh_token)
-
-        # Generate new token pair
-        token_data = create_token_pair(user.id, user.email)
-
-        # Store new refresh token in database
-        store.store_refresh_token(
-            user_id=user.id,
-            token=token_data["refresh_token"],
-            expires_at=token_data["refresh_expires_at"],
-        )
+        access_token = create_access_token(user.id, user.email, expires_delta=ACCESS_TOKEN_EXPIRES)
 
         return TokenResponse(
-            access_token=token_data["access_token"],
-            refresh_token=token_data["refresh_token"],
-            token_type=token_data["token_type"],
-            expires_in=token_data["expires_in"],
+            access_token=access_token,
+            refresh_token=new_refresh_token,
+            token_type="bearer",
+            expires_in=ACCESS_TOKEN_EXPIRES_IN,
         )
 
     # --- PROTECTED ENDPOINTS ---
 
-    @app.get("/auth/me", response_model=UserProfile)
-    def get_current_user_profile(current_user: User = Depends(get_current_user)) -> UserProfile:
+    @app.get(
+        "/auth/me",
+        response_model=UserProfile,
+        responses={status.HTTP_304_NOT_MODIFIED: {"description": "Profile unchanged"}},
+    )
+    async def get_current_user_profile(
+        request: Request,
+        response: Response,
+        current_user: User = Depends(get_current_user),
+    ) -> UserProfile | Response:
         """Get the current authenticated user's profile.
 
+        The response carries an ETag; a request whose ``If-None-Match``
+        matches it gets an empty 304 instead of the profile body.
+
         Args:
+            request: Incoming request (for conditional headers)
+            response: Outgoing response (for caching headers)
             current_user: Authenticated user from JWT token
 
         Returns:
-            User profile information
+            User profile information, or a 304 response if unchanged
         """
-        return UserProfile(
-            id=current_user.id,
-            email=current_user.email,
-            full_name=current_user.full_name,
-            exam_date=current_user.exam_date,
-            subscription_tier=current_user.subscription_tier,
-            subscription_start=current_user.subscription_start,
-            subscription_end=current_user.subscription_end,
-            created_at=current_user.created_at,
-            last_login=current_user.last_login,
-            is_active=current_user.is_active,
-        )
+        profile = UserProfile.from_user(current_user)
+        headers = {
+            "ETag": _profile_etag(profile),
+            "Cache-Control": PROFILE_CACHE_CONTROL,
+            "Vary": "Authorization",
+        }
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+        return profile
 
     @app.patch("/auth/me", response_model=UserProfile)
-    def update_current_user_profile(
+    async def update_current_user_profile(
         user_data: UserUpdate,
         current_user: User = Depends(get_current_user),
         store: UserStore = Depends(get_store),
+        session: Session = Depends(get_session),
     ) -> UserProfile:
         """Update the current authenticated user's profile.
 
@@ -265,6 +323,7 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
             user_data: Updated user data
             current_user: Authenticated user from JWT token
             store: User store instance
+            session: Request-scoped database session
 
         Returns:
             Updated user profile
@@ -273,43 +332,36 @@ def create_app(*, store: Optional[UserStore] = None) -> FastAPI:
             HTTPException: If update fails
         """
         try:
-            updated_user = store.update_user(current_user.id, user_data)
+            updated_user = await run_in_threadpool(
+                store.update_user, current_user.id, user_data, session=session
+            )
         except KeyError as exc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             ) from exc
 
-        return UserProfile(
-            id=updated_user.id,
-            email=updated_user.email,
-            full_name=updated_user.full_name,
-            exam_date=updated_user.exam_date,
-            subscription_tier=updated_user.subscription_tier,
-            subscription_start=updated_user.subscription_start,
-            subscription_end=updated_user.subscription_end,
-            created_at=updated_user.created_at,
-            last_login=updated_user.last_login,
-            is_active=updated_user.is_active,
-        )
+        return UserProfile.from_user(updated_user)
 
     @app.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
-    def logout(
+    async def logout(
         current_user: User = Depends(get_current_user),
         store: UserStore = Depends(get_store),
+        session: Session = Depends(get_session),
     ) -> None:
         """Logout the current user and revoke all refresh tokens.
 
         Args:
             current_user: Authenticated user from JWT token
             store: User store instance
+            session: Request-scoped database session
 
         Note:
             This revokes all refresh tokens for the user. Access tokens
             remain valid until expiration (15 minutes) due to stateless JWT design.
         """
         # Revoke all refresh tokens for this user
-        store.revoke_all_user_tokens(current_user.id)
+        await run_in_threadpool(store.revoke_all_user_tokens, current_user.id, session=session)
         # Access tokens cannot be invalidated server-side (stateless JWT)
         # They will expire in 15 minutes
 
@@ -1,29 +1,207 @@
-"""Authentication utilities for password hashing and JWT token management."""
+"""Authentication utilities for password hashing and JWT token management.
+
+Token decoding invariant: every request verifies a JWT exactly once. The
+``decode_*`` helpers perform a single signature-verified decode that
+also enforces the presence of all required claims, so callers read claims
+from the returned payload and never parse the token a second time. Verified
+access-token claims are cached until the token expires, so a bearer token
+reused across requests is verified once in its lifetime.
+"""
 
 from __future__ import annotations
 
+import hashlib
 import os
+import threading
+import time
+import uuid
+import warnings
+from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Optional
 
+import bcrypt
 import jwt
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cryptography.hazmat.primitives import hashes, hmac as crypto_hmac
+from jwt.algorithms import get_default_algorithms
+from jwt.utils import base64url_encode
+from jwt.warnings import InsecureKeyLengthWarning
 from passlib.context import CryptContext
 
-# Password hashing configuration using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: new hashes use argon2id. bcrypt hashes created before the
+# migration are verified directly through the C extension and upgraded to
+# argon2id on the next successful login.
+# Defaults are the OWASP argon2id baseline (19 MiB, 2 passes, 1 lane);
+# hashes made with other parameters are rehashed on the next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+_argon2 = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+_bcrypt_checkpw = bcrypt.checkpw
+
+# Verified against when no account matches, so a login for an unknown email
+# takes as long as one with a wrong password
+_DUMMY_HASH = _argon2.hash(uuid.uuid4().hex)
+
+# Fallback for legacy hash formats the fast paths above don't recognize
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=10,
+    bcrypt__ident="2b",
+)
+
+# Dedicated pool for CPU-bound password hashing so async handlers never run
+# the KDF on the event loop (argon2 and bcrypt both release the GIL)
+password_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count(),
+    thread_name_prefix="password-hash",
+)
 
 # JWT configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-key-change-in-production")
-JWT_ALGORITHM = "HS256"
+JWT_LEGACY_ALGORITHM = "HS256"
+
+# EdDSA (Ed25519) signing is enabled by configuring a PEM key pair. Services
+# that only verify tokens need just JWT_PUBLIC_KEY; the users service also
+# needs JWT_PRIVATE_KEY. Without keys, tokens are signed with HS256.
+JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY")
+JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
+# Accept HS256 tokens alongside EdDSA during the rollover window. Off by
+# default, and only allowed with an explicit JWT_SECRET: the fallback secret
+# above is public, so anyone could forge HS256 tokens with it.
+JWT_ACCEPT_LEGACY_HS256 = os.getenv("JWT_ACCEPT_LEGACY_HS256", "false").lower() == "true"
+if JWT_ACCEPT_LEGACY_HS256 and "JWT_SECRET" not in os.environ:
+    raise RuntimeError("JWT_ACCEPT_LEGACY_HS256 requires JWT_SECRET to be set")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))  # 15 minutes
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))  # 7 days
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days (legacy, for backwards compatibility)
 JWT_ISSUER = os.getenv("JWT_ISSUER", "ms2-qbank")
 JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "ms2-qbank-api")
 
+# Token lifetimes are fixed at import; build them once instead of per token
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+ACCESS_TOKEN_EXPIRES_IN = ACCESS_TOKEN_EXPIRE_MINUTES * 60  # seconds
+REFRESH_TOKEN_EXPIRES = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+_REFRESH_TOKEN_EXPIRES_IN = REFRESH_TOKEN_EXPIRE_DAYS * 86400  # seconds
+_LEGACY_TOKEN_EXPIRES = timedelta(hours=JWT_EXPIRATION_HOURS)
+
+# Key objects are loaded once at import so PyJWT never re-parses PEM per call
+if JWT_PRIVATE_KEY or JWT_PUBLIC_KEY:
+    from cryptography.hazmat.primitives.serialization import (
+        load_pem_private_key,
+        load_pem_public_key,
+    )
+
+    JWT_ALGORITHM = "EdDSA"
+    _signing_key = load_pem_private_key(JWT_PRIVATE_KEY.encode(), password=None) if JWT_PRIVATE_KEY else None
+    _verifying_key = (
+        load_pem_public_key(JWT_PUBLIC_KEY.encode()) if JWT_PUBLIC_KEY else _signing_key.public_key()
+    )
+else:
+    JWT_ALGORITHM = JWT_LEGACY_ALGORITHM
+    _signing_key = JWT_SECRET
+    _verifying_key = JWT_SECRET
+
+
+_HMAC_HASHES = {"HS256": hashes.SHA256(), "HS384": hashes.SHA384(), "HS512": hashes.SHA512()}
+
+
+class _PreparedKey:
+    """Signing or verification key prepared once for a single algorithm.
+
+    PyJWT prepares a raw key again on every call; for PEM keys that means
+    parsing the PEM each time, so keys are loaded once here and PyJWT is
+    given the prepared key. HMAC signing keys additionally keep a keyed
+    OpenSSL HMAC context that is copied per token, so the key schedule is
+    derived once and hashing runs through OpenSSL's EVP (SHA-NI where
+    available).
+    """
+
+    __slots__ = ("algorithm_name", "algorithms", "algorithm", "key", "_hmac")
+
+    def __init__(self, algorithm_name: str, key: Any) -> None:
+        self.algorithm_name = algorithm_name
+        self.algorithms = [algorithm_name]  # allow-list passed to decode
+        self.algorithm = get_default_algorithms()[algorithm_name]
+        self.key = self.algorithm.prepare_key(key)
+        key_length_msg = self.algorithm.check_key_length(self.key)
+        if key_length_msg:
+            warnings.warn(key_length_msg, InsecureKeyLengthWarning, stacklevel=2)
+        hash_algorithm = _HMAC_HASHES.get(algorithm_name)
+        self._hmac = crypto_hmac.HMAC(self.key, hash_algorithm) if hash_algorithm else None
+
+    def sign(self, message: bytes) -> bytes:
+        """Sign a JWS signing input."""
+        if self._hmac is None:
+            return self.algorithm.sign(message, self.key)
+        mac = self._hmac.copy()
+        mac.update(message)
+        return mac.finalize()
+
+
+class _TokenSigner:
+    """Encode JWTs with a prepared key and a cached header segment.
+
+    Only the claims segment differs between tokens, so the algorithm lookup,
+    key preparation, and header serialization that ``jwt.encode`` repeats on
+    every call are done once here.
+    """
+
+    __slots__ = ("_key", "_header_segment")
+
+    def __init__(self, algorithm_name: str, key: Any) -> None:
+        self._key = _PreparedKey(algorithm_name, key) if key is not None else None
+        self._header_segment = base64url_encode(orjson.dumps({"alg": algorithm_name, "typ": "JWT"}))
+
+    def sign(self, payload: dict) -> str:
+        """Serialize, sign, and encode a claims dict as a compact JWS."""
+        if self._key is None:
+            raise RuntimeError("JWT_PRIVATE_KEY is required to issue EdDSA tokens")
+        for claim in ("exp", "iat", "nbf"):
+            value = payload.get(claim)
+            if isinstance(value, datetime):
+                payload[claim] = timegm(value.utctimetuple())
+        signing_input = self._header_segment + b"." + base64url_encode(orjson.dumps(payload))
+        signature = self._key.sign(signing_input)
+        return (signing_input + b"." + base64url_encode(signature)).decode("ascii")
+
+
+_signer = _TokenSigner(JWT_ALGORITHM, _signing_key)
+_verifier = _PreparedKey(JWT_ALGORITHM, _verifying_key)
+_legacy_verifier = _PreparedKey(JWT_LEGACY_ALGORITHM, JWT_SECRET)
+_jwt = jwt.PyJWT()
+
+# Claim checks shared by every decode; built once instead of per call.
+# iss and aud are compared directly against the constants after decoding
+# rather than passed to PyJWT, which normalizes both on every call.
+_DECODE_OPTIONS = {
+    "verify_signature": True,
+    "verify_exp": True,
+    "verify_nbf": True,
+    "verify_iat": True,
+    "verify_aud": False,
+    "verify_iss": False,
+    "require": ["exp", "iat", "nbf", "iss", "aud", "sub"],
+}
+
+# Verified access-token claims keyed by a digest of the token, with the
+# token's exp as the eviction time
+_token_cache: dict[bytes, tuple[dict, int]] = {}
+_token_cache_maxsize = 10_000
+_token_cache_lock = threading.Lock()
+
 
 def hash_password(password: str) -> str:
-    """Hash a plain text password using bcrypt.
+    """Hash a plain text password using argon2id.
 
     Args:
         password: Plain text password to hash
@@ -31,12 +209,15 @@ def hash_password(password: str) -> str:
     Returns:
         Hashed password string
     """
-    return pwd_context.hash(password)
+    return _argon2.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain text password against a hashed password.
 
+    Dispatches on the hash prefix: argon2id and bcrypt ``$2b$`` hashes are
+    checked directly by their C libraries; anything else goes through passlib.
+
     Args:
         plain_password: Plain text password to verify
         hashed_password: Hashed password to compare against
@@ -44,9 +225,44 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if password matches, False otherwise
     """
+    try:
+        if hashed_password.startswith("$argon2id$"):
+            return _argon2.verify(hashed_password, plain_password)
+        if hashed_password.startswith("$2b$"):
+            return _bcrypt_checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except (VerificationError, InvalidHashError, ValueError):
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: Optional[str]
+) -> tuple[bool, Optional[str]]:
+    """Verify a password and produce a replacement hash if the stored one is outdated.
+
+    Any non-argon2id hash, or an argon2id hash with outdated parameters, is
+    considered outdated.
+
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Hashed password to compare against, or None when no
+            account matched. A dummy hash is then verified so the call takes
+            as long as a real mismatch.
+
+    Returns:
+        Tuple of (matches, new_hash). ``new_hash`` is None unless the password
+        matched and the stored hash uses an outdated scheme or parameters.
+    """
+    if hashed_password is None:
+        verify_password(plain_password, _DUMMY_HASH)
+        return False, None
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if hashed_password.startswith("$argon2id$") and not _argon2.check_needs_rehash(hashed_password):
+        return True, None
+    return True, hash_password(plain_password)
+
+
 def create_access_token(user_id: int, email: str, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token for a user.
 
@@ -60,30 +276,69 @@ def create_access_token(user_id: int, email: str, expires_delta: Optional[timede
 
     The token includes the following claims for enhanced security:
     - sub: User ID (subject)
+    - uid: User ID as an integer, so readers need not parse ``sub``
     - email: User's email address
     - exp: Expiration time
     - iat: Issued at time
     - nbf: Not before time (same as iat, token valid immediately)
     - iss: Issuer identifier
     - aud: Intended audience
+    - jti: Unique token ID so tokens issued in the same second still differ
     """
     if expires_delta is None:
-        expires_delta = timedelta(hours=JWT_EXPIRATION_HOURS)
+        expires_delta = _LEGACY_TOKEN_EXPIRES
 
-    now = datetime.now(timezone.utc)
-    expire = now + expires_delta
+    # Claims are built as integer timestamps so the signer has no datetime
+    # conversion left to do
+    now = int(time.time())
+    expire = now + int(expires_delta.total_seconds())
 
     payload = {
         "sub": str(user_id),  # Subject: user ID
+        "uid": user_id,  # Integer user ID
         "email": email,
+        "type": "access",
         "exp": expire,  # Expiration time
         "iat": now,  # Issued at
         "nbf": now,  # Not before (valid immediately)
         "iss": JWT_ISSUER,  # Issuer
         "aud": JWT_AUDIENCE,  # Audience
+        "jti": uuid.uuid4().hex,  # Token ID
     }
 
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return _signer.sign(payload)
+
+
+def _decode_token(token: str) -> dict:
+    """Verify a token's signature and standard claims with a single decode.
+
+    Tokens are verified with the configured algorithm. When EdDSA is enabled
+    and legacy tokens are explicitly accepted, a token whose header names HS256 is
+    rejected by PyJWT before any signature work and verified against
+    JWT_SECRET instead, so each token is still only verified once.
+    """
+    try:
+        payload = _jwt.decode(
+            token,
+            _verifier.key,
+            algorithms=_verifier.algorithms,
+            options=_DECODE_OPTIONS,
+        )
+    except jwt.InvalidAlgorithmError:
+        if JWT_ALGORITHM == JWT_LEGACY_ALGORITHM or not JWT_ACCEPT_LEGACY_HS256:
+            raise
+        payload = _jwt.decode(
+            token,
+            _legacy_verifier.key,
+            algorithms=_legacy_verifier.algorithms,
+            options=_DECODE_OPTIONS,
+        )
+
+    if payload["iss"] != JWT_ISSUER:
+        raise jwt.InvalidIssuerError("Invalid issuer")
+    if payload["aud"] != JWT_AUDIENCE:
+        raise jwt.InvalidAudienceError("Audience doesn't match")
+    return payload
 
 
 def decode_access_token(token: str) -> dict:
@@ -107,23 +362,34 @@ def decode_access_token(token: str) -> dict:
         jwt.InvalidIssuerError: If token issuer doesn't match
         jwt.InvalidAudienceError: If token audience doesn't match
         jwt.InvalidTokenError: If token is otherwise invalid
+
+    Note:
+        Successfully verified payloads are cached until their ``exp`` and
+        shared between callers, so treat the returned dict as read-only.
     """
-    return jwt.decode(
-        token,
-        JWT_SECRET,
-        algorithms=[JWT_ALGORITHM],
-        issuer=JWT_ISSUER,
-        audience=JWT_AUDIENCE,
-        options={
-            "verify_signature": True,
-            "verify_exp": True,
-            "verify_nbf": True,
-            "verify_iat": True,
-            "verify_aud": True,
-            "verify_iss": True,
-            "require": ["exp", "iat", "nbf", "iss", "aud", "sub"],
-        },
-    )
+    cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+    if cached is not None and time.time() < cached[1]:
+        return cached[0]
+
+    payload = _decode_token(token)
+    with _token_cache_lock:
+        if cache_key not in _token_cache and len(_token_cache) >= _token_cache_maxsize:
+            # Evict the oldest entry (dicts preserve insertion order)
+            _token_cache.pop(next(iter(_token_cache)))
+        _token_cache[cache_key] = (payload, payload["exp"])
+    return payload
+
+
+def clear_token_cache() -> None:
+    """Forget all cached access-token verifications.
+
+    Call this after changing signing keys or legacy-token acceptance at
+    runtime so cached tokens are verified again under the new settings.
+    """
+    with _token_cache_lock:
+        _token_cache.clear()
 
 
 def get_user_id_from_token(token: str) -> Optional[int]:
@@ -140,17 +406,66 @@ def get_user_id_from_token(token: str) -> Optional[int]:
     """
     try:
         payload = decode_access_token(token)
-        user_id = payload.get("sub")
-        return int(user_id) if user_id else None
-    except (
-        jwt.ExpiredSignatureError,
-        jwt.ImmatureSignatureError,
-        jwt.InvalidIssuerError,
-        jwt.InvalidAudienceError,
-        jwt.InvalidTokenError,
-        ValueError,
-    ):
+    except jwt.InvalidTokenError:
         return None
+    return get_user_id_from_claims(payload)
+
+
+def get_user_id_from_claims(payload: dict) -> Optional[int]:
+    """Read the user ID from a verified token payload.
+
+    Tokens carry the ID as the integer ``uid`` claim. Tokens issued before
+    that claim was added only have the string ``sub``, which is parsed as a
+    fallback until they expire.
+
+    Args:
+        payload: Decoded token claims
+
+    Returns:
+        User ID, or None if the payload does not identify a user
+    """
+    uid = payload.get("uid")
+    if type(uid) is int:
+        return uid
+    sub = payload.get("sub")
+    return int(sub) if isinstance(sub, str) and sub.isdecimal() else None
+
+
+def hash_refresh_token(token: str) -> bytes:
+    """Compute the digest under which a refresh token is stored.
+
+    Args:
+        token: Refresh token string
+
+    Returns:
+        32-byte SHA-256 digest of the token
+    """
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def create_refresh_token(user_id: int) -> tuple[str, datetime]:
+    """Create a long-lived refresh token for a user.
+
+    Args:
+        user_id: User's database ID
+
+    Returns:
+        Tuple of (encoded refresh token, expiration timestamp)
+    """
+    now = int(time.time())
+    exp = now + _REFRESH_TOKEN_EXPIRES_IN
+    payload = {
+        "sub": str(user_id),
+        "uid": user_id,
+        "type": "refresh",
+        "exp": exp,
+        "iat": now,
+        "nbf": now,
+        "iss": JWT_ISSUER,
+        "aud": JWT_AUDIENCE,
+        "jti": uuid.uuid4().hex,
+    }
+    return _signer.sign(payload), datetime.fromtimestamp(exp, timezone.utc)
 
 
 def create_token_pair(user_id: int, email: str) -> dict:
@@ -166,49 +481,28 @@ def create_token_pair(user_id: int, email: str) -> dict:
             - refresh_token: Long-lived refresh token (7 days)
             - token_type: "bearer"
             - expires_in: Access token expiration in seconds
+            - refresh_expires_at: Refresh token expiration timestamp
     """
-    now = datetime.now(timezone.utc)
-
     # Create short-lived access token (15 minutes)
-    access_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_payload = {
-        "sub": str(user_id),
-        "email": email,
-        "type": "access",
-        "exp": now + access_expires,
-        "iat": now,
-        "nbf": now,
-        "iss": JWT_ISSUER,
-        "aud": JWT_AUDIENCE,
-    }
-    access_token = jwt.encode(access_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    access_token = create_access_token(user_id, email, expires_delta=ACCESS_TOKEN_EXPIRES)
 
     # Create long-lived refresh token (7 days)
-    refresh_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_payload = {
-        "sub": str(user_id),
-        "type": "refresh",
-        "exp": now + refresh_expires,
-        "iat": now,
-        "nbf": now,
-        "iss": JWT_ISSUER,
-        "aud": JWT_AUDIENCE,
-    }
-    refresh_token = jwt.encode(refresh_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    refresh_token, refresh_expires_at = create_refresh_token(user_id)
 
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # Convert to seconds
-        "refresh_expires_at": now + refresh_expires,
+        "expires_in": ACCESS_TOKEN_EXPIRES_IN,
+        "refresh_expires_at": refresh_expires_at,
     }
 
 
 def decode_refresh_token(token: str) -> dict:
     """Decode and validate a refresh token.
 
-    Validates all standard claims including issuer and audience.
+    Validates all standard claims including issuer and audience, and requires
+    the ``sub`` claim so callers can read it from the returned payload.
 
     Args:
         token: Refresh token string
@@ -220,21 +514,7 @@ def decode_refresh_token(token: str) -> dict:
         jwt.ExpiredSignatureError: If token has expired
         jwt.InvalidTokenError: If token is invalid or not a refresh token
     """
-    payload = jwt.decode(
-        token,
-        JWT_SECRET,
-        algorithms=[JWT_ALGORITHM],
-        issuer=JWT_ISSUER,
-        audience=JWT_AUDIENCE,
-        options={
-            "verify_signature": True,
-            "verify_exp": True,
-            "verify_nbf": True,
-            "verify_iat": True,
-            "verify_aud": True,
-            "verify_iss": True,
-        },
-    )
+    payload = _decode_token(token)
 
     # Verify this is a refresh token
     if payload.get("type") != "refresh":
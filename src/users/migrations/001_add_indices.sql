@@ -0,0 +1,16 @@
+-- Users database indices for performance optimization
+
+-- Partial index over live (unrevoked) refresh tokens per user
+-- Supports logout: "revoke every live token for user X"
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_live
+    ON refresh_tokens(user_id) WHERE revoked = 0;
+
+-- Index for a user's tokens by expiry
+-- Supports the purge run on every token issue: "delete expired tokens for user X"
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user_expires
+    ON refresh_tokens(user_id, expires_at);
+
+-- Index for the global expiry sweep
+-- Supports cleanup_expired_tokens: "delete all tokens expired before now"
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires
+    ON refresh_tokens(expires_at);
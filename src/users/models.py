@@ -6,7 +6,7 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from pydantic import BaseModel, EmailStr, Field
-from sqlmodel import Column, DateTime, Field as SQLField, SQLModel
+from sqlmodel import Column, DateTime, Field as SQLField, LargeBinary, SQLModel
 
 
 class User(SQLModel, table=True):
@@ -61,13 +61,16 @@ class RefreshToken(SQLModel, table=True):
 
     Allows users to obtain new access tokens without re-authenticating.
     Tokens can be revoked for security (logout, password change, etc.).
+    Only the SHA-256 digest of each token is stored, never the token itself.
     """
 
     __tablename__ = "refresh_tokens"
 
     id: Optional[int] = SQLField(default=None, primary_key=True)
     user_id: int = SQLField(foreign_key="users.id", index=True)
-    token: str = SQLField(unique=True, index=True, max_length=500)
+    token_hash: bytes = SQLField(
+        sa_column=Column(LargeBinary(32), unique=True, index=True, nullable=False),
+    )
     expires_at: datetime = SQLField(
         sa_column=Column(DateTime(timezone=True), nullable=False),
     )
@@ -124,6 +127,26 @@ class UserProfile(BaseModel):
     last_login: Optional[datetime]
     is_active: bool
 
+    @classmethod
+    def from_user(cls, user: User) -> UserProfile:
+        """Build a profile from a stored user without re-running validation.
+
+        ``User`` rows are already validated, so the fields are copied with
+        ``model_construct`` instead of going through the validators again.
+        """
+        return cls.model_construct(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            exam_date=user.exam_date,
+            subscription_tier=user.subscription_tier,
+            subscription_start=user.subscription_start,
+            subscription_end=user.subscription_end,
+            created_at=user.created_at,
+            last_login=user.last_login,
+            is_active=user.is_active,
+        )
+
 
 class UserUpdate(BaseModel):
     """Request payload for updating user profile."""
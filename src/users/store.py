@@ -2,17 +2,28 @@
 
 from __future__ import annotations
 
-import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from time import monotonic
+from typing import Iterator, Optional
 
-from sqlmodel import Session, SQLModel, select
+import orjson
+from sqlalchemy import event, exists, func, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel, delete, select, update
 
-from db_utils import create_hardened_sqlite_engine
-from .auth import hash_password, verify_password
+from db_utils import create_hardened_sqlite_engine, run_migrations_for_engine
+from .auth import hash_password, hash_refresh_token, verify_and_update_password
 from .models import RefreshToken, User, UserCreate, UserUpdate
 
+# SQLite stores ``expires_at`` as UTC text ("YYYY-MM-DD HH:MM:SS.ffffff"), so the
+# current time is rendered in the same lexical format to compare inside SQL.
+# ``CURRENT_TIMESTAMP`` would drop the fractional seconds and keep tokens alive
+# for up to a second past expiry.
+_SQL_UTC_NOW = func.strftime("%Y-%m-%d %H:%M:%f", "now")
+
 
 class UserStore:
     """Handle user data persistence with SQLite database."""
@@ -28,14 +39,102 @@ class UserStore:
             db_path = Path(database_url.replace("sqlite:///", ""))
             db_path.parent.mkdir(parents=True, exist_ok=True)
 
-        self.engine = create_hardened_sqlite_engine(database_url, echo=False)
+        # A fixed pool sized for concurrent requests; SQLite connections are
+        # local files, so liveness pings are unnecessary
+        self.engine = create_hardened_sqlite_engine(
+            database_url,
+            echo=False,
+            pool_size=20,
+            max_overflow=0,
+            pool_pre_ping=False,
+        )
+        # Runs after the hardened engine's WAL/synchronous pragmas
+        event.listen(self.engine, "connect", self._configure_connection)
+        # Objects stay loaded after commit, so no SELECT is reissued when a
+        # returned object is read after its session commits
+        self._session_factory = sessionmaker(bind=self.engine, class_=Session, expire_on_commit=False)
         SQLModel.metadata.create_all(self.engine)
+        self._migrate_refresh_token_hashes()
+        run_migrations_for_engine(self.engine, Path(__file__).parent / "migrations")
+
+        # Short-TTL cache for users resolved on every authenticated request
+        self._user_cache: dict[int, tuple[User, float]] = {}
+        self._user_cache_ttl = 15  # seconds
+        self._user_cache_maxsize = 10_000
+        self._user_cache_lock = threading.Lock()
+
+    @staticmethod
+    def _configure_connection(dbapi_connection, _) -> None:
+        """Apply memory pragmas for the user database on each new connection.
+
+        The hardened engine already enables WAL and NORMAL synchronous mode;
+        this keeps temporary tables in memory and lets reads of the small,
+        hot auth tables come from a memory map instead of ``read()`` calls.
+        The page cache is sized per connection, so it stays modest for a
+        pool of 20.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.execute("PRAGMA mmap_size = 268435456")  # 256 MiB
+        cursor.execute("PRAGMA cache_size = -8000")  # 8 MiB
+        cursor.close()
+
+    def session(self) -> Session:
+        """Open a session that several store calls can share.
+
+        Pass the returned session as ``session=`` to reuse one connection
+        and identity map across calls, e.g. for the duration of a request.
+        Objects are not expired on commit so they stay usable after close.
+
+        Returns:
+            New SQLModel session bound to this store's engine
+        """
+        return self._session_factory()
+
+    @contextmanager
+    def _session_scope(self, session: Optional[Session]) -> Iterator[Session]:
+        """Yield the caller's shared session, or a short-lived one owned by this call."""
+        if session is not None:
+            yield session
+            return
+        with self.session() as owned:
+            yield owned
+
+    def _migrate_refresh_token_hashes(self) -> None:
+        """Replace raw refresh tokens in older databases with their digests.
+
+        Databases created before tokens were hashed have a ``token`` column.
+        The table is rebuilt in a single transaction so every live session
+        keeps working after the upgrade.
+        """
+        columns = {column["name"] for column in inspect(self.engine).get_columns("refresh_tokens")}
+        if "token" not in columns:
+            return
+
+        with self.engine.begin() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT id, user_id, token, expires_at, created_at, revoked, device_info "
+                "FROM refresh_tokens"
+            ).all()
+            conn.exec_driver_sql("DROP TABLE refresh_tokens")
+            RefreshToken.__table__.create(conn)
+            if rows:
+                conn.exec_driver_sql(
+                    "INSERT INTO refresh_tokens "
+                    "(id, user_id, token_hash, expires_at, created_at, revoked, device_info) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (row[0], row[1], hash_refresh_token(row[2]), *row[3:])
+                        for row in rows
+                    ],
+                )
 
-    def create_user(self, user_data: UserCreate) -> User:
+    def create_user(self, user_data: UserCreate, session: Optional[Session] = None) -> User:
         """Create a new user account.
 
         Args:
             user_data: User registration data
+            session: Optional shared session (see :meth:`session`)
 
         Returns:
             Created user object
@@ -43,64 +142,138 @@ class UserStore:
         Raises:
             ValueError: If email already exists
         """
-        with Session(self.engine) as session:
-            # Check if email already exists
-            existing = session.exec(
-                select(User).where(User.email == user_data.email)
-            ).first()
-            if existing:
+        # Hash before opening the session so no connection is held during the KDF
+        hashed_password = hash_password(user_data.password)
+
+        with self._session_scope(session) as session:
+            # Check if email already exists without loading the row
+            if session.exec(select(exists().where(User.email == user_data.email))).one():
                 raise ValueError(f"User with email {user_data.email} already exists")
 
             # Create new user with hashed password
             user = User(
                 email=user_data.email,
-                hashed_password=hash_password(user_data.password),
+                hashed_password=hashed_password,
                 full_name=user_data.full_name,
                 exam_date=user_data.exam_date,
             )
 
+            # Every column default is assigned in Python and the id is filled in
+            # by the INSERT, so with expire_on_commit=False no reload is needed.
             session.add(user)
             session.commit()
-            session.refresh(user)
             return user
 
-    def authenticate(self, email: str, password: str) -> Optional[User]:
+    def authenticate(
+        self, email: str, password: str, session: Optional[Session] = None
+    ) -> Optional[User]:
         """Authenticate a user with email and password.
 
         Args:
             email: User's email address
             password: Plain text password
+            session: Optional shared session (see :meth:`session`)
 
         Returns:
             User object if authentication successful, None otherwise
         """
-        with Session(self.engine) as session:
-            user = session.exec(select(User).where(User.email == email)).first()
+        # Only the columns needed to verify are loaded, and the read
+        # transaction ends before the password check so the connection is
+        # not held for the duration of the KDF
+        with self._session_scope(session) as db:
+            credentials = db.exec(
+                select(User.id, User.hashed_password).where(
+                    User.email == email,
+                    User.is_active == True,
+                )
+            ).first()
+            db.commit()
+
+        # Unknown and inactive accounts still pay for a (dummy) password
+        # check so response times do not reveal which emails exist
+        hashed_password = credentials.hashed_password if credentials is not None else None
+        verified, new_hash = verify_and_update_password(password, hashed_password)
+        if not verified:
+            return None
+        user_id = credentials.id
+
+        # Stamp last login (and transparently upgrade hashes created with
+        # outdated parameters) with one UPDATE that returns the row
+        values: dict = {"last_login": datetime.now(timezone.utc)}
+        if new_hash is not None:
+            values["hashed_password"] = new_hash
+
+        with self._session_scope(session) as db:
+            user = db.exec(
+                update(User).where(User.id == user_id).values(**values).returning(User)
+            ).scalars().first()
+            db.commit()
+        if user is None:
+            return None
+
+        self.clear_user_cache(user_id)
+        return user
+
+    def get_user_by_id(self, user_id: int, session: Optional[Session] = None) -> Optional[User]:
+        """Retrieve a user by their ID.
 
-            if not user or not user.is_active:
-                return None
+        Results are cached for a few seconds; writes through this store
+        invalidate the cached entry immediately.
 
-            if not verify_password(password, user.hashed_password):
-                return None
+        Args:
+            user_id: User's database ID
+            session: Optional shared session (see :meth:`session`)
 
-            # Update last login timestamp
-            user.last_login = datetime.now(timezone.utc)
-            session.add(user)
-            session.commit()
-            session.refresh(user)
+        Returns:
+            User object if found, None otherwise
+        """
+        user = self.get_cached_user(user_id)
+        if user is not None:
             return user
 
-    def get_user_by_id(self, user_id: int) -> Optional[User]:
-        """Retrieve a user by their ID.
+        now = monotonic()
+        with self._session_scope(session) as session:
+            user = session.get(User, user_id)
+            if user is not None:
+                # Cached users are shared across requests; keep them out of
+                # any caller's identity map
+                session.expunge(user)
+
+        if user is not None:
+            with self._user_cache_lock:
+                if user_id not in self._user_cache and len(self._user_cache) >= self._user_cache_maxsize:
+                    # Evict the oldest entry (dicts preserve insertion order)
+                    self._user_cache.pop(next(iter(self._user_cache)))
+                self._user_cache[user_id] = (user, now)
+        return user
+
+    def get_cached_user(self, user_id: int) -> Optional[User]:
+        """Return a user from the in-process cache without touching the database.
 
         Args:
             user_id: User's database ID
 
         Returns:
-            User object if found, None otherwise
+            Cached user object if present and fresh, None otherwise
         """
-        with Session(self.engine) as session:
-            return session.get(User, user_id)
+        with self._user_cache_lock:
+            cached = self._user_cache.get(user_id)
+        if cached is not None and monotonic() - cached[1] < self._user_cache_ttl:
+            return cached[0]
+        return None
+
+    def clear_user_cache(self, user_id: Optional[int] = None) -> None:
+        """Clear cached users.
+
+        Args:
+            user_id: If provided, clear cache only for this user.
+                     If None, clear entire cache.
+        """
+        with self._user_cache_lock:
+            if user_id is not None:
+                self._user_cache.pop(user_id, None)
+            else:
+                self._user_cache.clear()
 
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Retrieve a user by their email address.
@@ -111,15 +284,18 @@ class UserStore:
         Returns:
             User object if found, None otherwise
         """
-        with Session(self.engine) as session:
+        with self.session() as session:
             return session.exec(select(User).where(User.email == email)).first()
 
-    def update_user(self, user_id: int, user_data: UserUpdate) -> User:
+    def update_user(
+        self, user_id: int, user_data: UserUpdate, session: Optional[Session] = None
+    ) -> User:
         """Update user profile information.
 
         Args:
             user_id: User's database ID
             user_data: Updated user data
+            session: Optional shared session (see :meth:`session`)
 
         Returns:
             Updated user object
@@ -127,25 +303,34 @@ class UserStore:
         Raises:
             KeyError: If user not found
         """
-        with Session(self.engine) as session:
+        # Collect provided fields; JSON fields are serialized once with orjson
+        updates: dict = {}
+        if user_data.full_name is not None:
+            updates["full_name"] = user_data.full_name
+        if user_data.exam_date is not None:
+            updates["exam_date"] = user_data.exam_date
+        if user_data.notification_preferences is not None:
+            updates["notification_preferences"] = orjson.dumps(user_data.notification_preferences).decode()
+        if user_data.display_settings is not None:
+            updates["display_settings"] = orjson.dumps(user_data.display_settings).decode()
+
+        with self._session_scope(session) as session:
             user = session.get(User, user_id)
             if not user:
                 raise KeyError(f"User {user_id} not found")
 
-            # Update fields if provided
-            if user_data.full_name is not None:
-                user.full_name = user_data.full_name
-            if user_data.exam_date is not None:
-                user.exam_date = user_data.exam_date
-            if user_data.notification_preferences is not None:
-                user.notification_preferences = json.dumps(user_data.notification_preferences)
-            if user_data.display_settings is not None:
-                user.display_settings = json.dumps(user_data.display_settings)
+            # Idempotent saves write nothing
+            changes = {field: value for field, value in updates.items() if getattr(user, field) != value}
+            if not changes:
+                return user
 
-            session.add(user)
+            user = session.exec(
+                update(User).where(User.id == user_id).values(**changes).returning(User)
+            ).scalars().first()
             session.commit()
-            session.refresh(user)
-            return user
+
+        self.clear_user_cache(user_id)
+        return user
 
     def deactivate_user(self, user_id: int) -> User:
         """Deactivate a user account (soft delete).
@@ -159,16 +344,30 @@ class UserStore:
         Raises:
             KeyError: If user not found
         """
-        with Session(self.engine) as session:
-            user = session.get(User, user_id)
+        with self.session() as session:
+            user = session.exec(
+                update(User).where(User.id == user_id).values(is_active=False).returning(User)
+            ).scalars().first()
             if not user:
                 raise KeyError(f"User {user_id} not found")
-
-            user.is_active = False
-            session.add(user)
             session.commit()
-            session.refresh(user)
-            return user
+
+        self.clear_user_cache(user_id)
+        return user
+
+    @staticmethod
+    def _purge_expired_tokens(session: Session, user_id: int) -> None:
+        """Delete a user's expired refresh tokens within the caller's transaction.
+
+        Runs whenever a token is issued, so the table stays bounded by the
+        number of live sessions without a separate cleanup job.
+        """
+        session.exec(
+            delete(RefreshToken).where(
+                RefreshToken.user_id == user_id,
+                RefreshToken.expires_at <= _SQL_UTC_NOW,
+            )
+        )
 
     def store_refresh_token(
         self,
@@ -176,28 +375,32 @@ class UserStore:
         token: str,
         expires_at: datetime,
         device_info: Optional[str] = None,
+        session: Optional[Session] = None,
     ) -> RefreshToken:
         """Store a refresh token in the database.
 
+        The user's expired tokens are purged in the same transaction.
+
         Args:
             user_id: User's database ID
-            token: JWT refresh token string
+            token: JWT refresh token string (only its digest is persisted)
             expires_at: Token expiration timestamp
             device_info: Optional device/browser information
+            session: Optional shared session (see :meth:`session`)
 
         Returns:
             Created RefreshToken object
         """
-        with Session(self.engine) as session:
+        with self._session_scope(session) as session:
+            self._purge_expired_tokens(session, user_id)
             refresh_token = RefreshToken(
                 user_id=user_id,
-                token=token,
+                token_hash=hash_refresh_token(token),
                 expires_at=expires_at,
                 device_info=device_info,
             )
             session.add(refresh_token)
             session.commit()
-            session.refresh(refresh_token)
             return refresh_token
 
     def get_refresh_token(self, token: str) -> Optional[RefreshToken]:
@@ -209,16 +412,77 @@ class UserStore:
         Returns:
             RefreshToken object if found and valid, None otherwise
         """
-        with Session(self.engine) as session:
+        with self.session() as session:
             refresh_token = session.exec(
                 select(RefreshToken).where(
-                    RefreshToken.token == token,
+                    RefreshToken.token_hash == hash_refresh_token(token),
                     RefreshToken.revoked == False,
-                    RefreshToken.expires_at > datetime.now(timezone.utc),
+                    RefreshToken.expires_at > _SQL_UTC_NOW,
                 )
             ).first()
             return refresh_token
 
+    def rotate_refresh_token(
+        self,
+        old_token: str,
+        new_token: str,
+        user_id: int,
+        expires_at: datetime,
+        device_info: Optional[str] = None,
+        session: Optional[Session] = None,
+    ) -> Optional[User]:
+        """Atomically exchange a refresh token for a newly issued one.
+
+        The old token is revoked with a single ``UPDATE ... RETURNING``, the
+        owning user is loaded, the user's expired tokens are purged, and the
+        new token is inserted, all within one transaction. If any step fails
+        the transaction is rolled back and the old token stays valid.
+
+        Args:
+            old_token: JWT refresh token being exchanged
+            new_token: Newly issued JWT refresh token
+            user_id: User's database ID from the verified token claims
+            expires_at: Expiration timestamp of the new token
+            device_info: Optional device/browser information
+            session: Optional shared session (see :meth:`session`)
+
+        Returns:
+            The active User owning the token, or None if the old token is
+            unknown, revoked, expired, or belongs to an inactive user
+        """
+        with self._session_scope(session) as session:
+            revoked = session.exec(
+                update(RefreshToken)
+                .where(
+                    RefreshToken.token_hash == hash_refresh_token(old_token),
+                    RefreshToken.user_id == user_id,
+                    RefreshToken.revoked == False,
+                    RefreshToken.expires_at > _SQL_UTC_NOW,
+                )
+                .values(revoked=True)
+                .returning(RefreshToken.user_id)
+            ).first()
+            if revoked is None:
+                session.rollback()
+                return None
+
+            user = session.get(User, user_id)
+            if user is None or not user.is_active:
+                session.rollback()
+                return None
+
+            self._purge_expired_tokens(session, user_id)
+            session.add(
+                RefreshToken(
+                    user_id=user_id,
+                    token_hash=hash_refresh_token(new_token),
+                    expires_at=expires_at,
+                    device_info=device_info,
+                )
+            )
+            session.commit()
+            return user
+
     def revoke_refresh_token(self, token: str) -> bool:
         """Revoke a specific refresh token.
 
@@ -228,62 +492,63 @@ class UserStore:
         Returns:
             True if token was revoked, False if not found
         """
-        with Session(self.engine) as session:
-            refresh_token = session.exec(
-                select(RefreshToken).where(RefreshToken.token == token)
-            ).first()
-
-            if not refresh_token:
-                return False
-
-            refresh_token.revoked = True
-            session.add(refresh_token)
+        with self.session() as session:
+            result = session.exec(
+                update(RefreshToken)
+                .where(RefreshToken.token_hash == hash_refresh_token(token))
+                .values(revoked=True)
+            )
             session.commit()
-            return True
+            return result.rowcount > 0
 
-    def revoke_all_user_tokens(self, user_id: int) -> int:
+    def revoke_all_user_tokens(self, user_id: int, session: Optional[Session] = None) -> int:
         """Revoke all refresh tokens for a user.
 
         Args:
             user_id: User's database ID
+            session: Optional shared session (see :meth:`session`)
 
         Returns:
             Number of tokens revoked
         """
-        with Session(self.engine) as session:
-            tokens = session.exec(
-                select(RefreshToken).where(
+        with self._session_scope(session) as session:
+            result = session.exec(
+                update(RefreshToken)
+                .where(
                     RefreshToken.user_id == user_id,
                     RefreshToken.revoked == False,
                 )
-            ).all()
-
-            count = 0
-            for token in tokens:
-                token.revoked = True
-                session.add(token)
-                count += 1
-
+                .values(revoked=True)
+            )
             session.commit()
-            return count
+            return result.rowcount
 
-    def cleanup_expired_tokens(self) -> int:
+    def cleanup_expired_tokens(self, batch_size: int = 5000) -> int:
         """Remove expired refresh tokens from the database.
 
+        Rows are deleted in batches, each in its own transaction, so a large
+        backlog never holds the SQLite write lock long enough to stall logins.
+
+        Args:
+            batch_size: Maximum number of rows deleted per transaction
+
         Returns:
             Number of tokens deleted
         """
-        with Session(self.engine) as session:
-            expired_tokens = session.exec(
-                select(RefreshToken).where(
-                    RefreshToken.expires_at < datetime.now(timezone.utc)
-                )
-            ).all()
-
-            count = 0
-            for token in expired_tokens:
-                session.delete(token)
-                count += 1
-
-            session.commit()
-            return count
+        expired_ids = (
+            select(RefreshToken.id)
+            # Same boundary as the per-user purge: a token stops being valid
+            # once expires_at is no longer in the future
+            .where(RefreshToken.expires_at <= _SQL_UTC_NOW)
+            .limit(batch_size)
+        )
+        total = 0
+        with self.session() as session:
+            while True:
+                deleted = session.exec(
+                    delete(RefreshToken).where(RefreshToken.id.in_(expired_ids))
+                ).rowcount
+                session.commit()
+                total += deleted
+                if deleted < batch_size:
+                    return total
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, Iterable, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Header, status
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Header, Request, Response, status
+from fastapi.middleware.gzip import GZipMiddleware
 
 from users.auth import decode_access_token
 
@@ -13,18 +16,76 @@ from .models import (
     BookmarkResponse,
     PlaylistAddVideo,
     PlaylistCreate,
+    PlaylistDB,
     PlaylistResponse,
     PlaylistUpdate,
+    VideoBookmarkDB,
     VideoCreate,
+    VideoDB,
+    VideoProgressDB,
     VideoProgressResponse,
     VideoProgressUpdate,
     VideoResponse,
     VideoUpdate,
 )
 from .store import VideoStore
+from .views import ViewCountBuffer
 
 
-def optional_auth(authorization: Optional[str] = Header(None)) -> Optional[int]:
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson.
+
+    List endpoints return it with plain dicts built from DB rows, which were
+    validated on write, so FastAPI's ``jsonable_encoder`` pass and response
+    model re-validation are skipped. The ``response_model`` declarations stay
+    for the OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+_VIDEO_FIELDS = tuple(VideoResponse.model_fields)
+_PLAYLIST_FIELDS = tuple(name for name in PlaylistResponse.model_fields if name != "video_count")
+_BOOKMARK_FIELDS = tuple(BookmarkResponse.model_fields)
+_PROGRESS_FIELDS = tuple(VideoProgressResponse.model_fields)
+
+
+def _rows_to_dicts(rows: Iterable[Any], fields: tuple[str, ...]) -> list[dict[str, Any]]:
+    """Copy the response fields of each DB row into a plain dict."""
+    return [{name: getattr(row, name) for name in fields} for row in rows]
+
+
+# Rows come straight from the database and were validated on write, so the
+# response models are built with model_construct instead of re-validated.
+
+
+def _to_video_response(video: VideoDB) -> VideoResponse:
+    return VideoResponse.model_construct(**{name: getattr(video, name) for name in _VIDEO_FIELDS})
+
+
+def _to_playlist_response(playlist: PlaylistDB, video_count: int) -> PlaylistResponse:
+    return PlaylistResponse.model_construct(
+        video_count=video_count,
+        **{name: getattr(playlist, name) for name in _PLAYLIST_FIELDS},
+    )
+
+
+def _to_progress_response(progress: VideoProgressDB) -> VideoProgressResponse:
+    return VideoProgressResponse.model_construct(
+        **{name: getattr(progress, name) for name in _PROGRESS_FIELDS}
+    )
+
+
+def _to_bookmark_response(bookmark: VideoBookmarkDB) -> BookmarkResponse:
+    return BookmarkResponse.model_construct(
+        **{name: getattr(bookmark, name) for name in _BOOKMARK_FIELDS}
+    )
+
+
+async def optional_auth(authorization: Optional[str] = Header(None)) -> Optional[int]:
     """Optional authentication - returns user_id if token present, None otherwise."""
     if not authorization or not authorization.startswith("Bearer "):
         return None
@@ -37,8 +98,12 @@ def optional_auth(authorization: Optional[str] = Header(None)) -> Optional[int]:
         return None
 
 
-def get_current_user_id(authorization: str = Header(..., alias="Authorization")) -> int:
-    """Required authentication - returns user_id or raises 401."""
+async def get_current_user_id(authorization: str = Header(..., alias="Authorization")) -> int:
+    """Required authentication - returns user_id or raises 401.
+
+    Token checks are CPU-only (and cached by ``decode_access_token``), so
+    both auth dependencies run on the event loop without a threadpool hop.
+    """
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authentication token")
 
@@ -53,33 +118,61 @@ def get_current_user_id(authorization: str = Header(..., alias="Authorization"))
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 
-def create_app(*, store: Optional[VideoStore] = None) -> FastAPI:
+def create_app(
+    *,
+    store: Optional[VideoStore] = None,
+    view_flush_interval: float = 2.0,
+) -> FastAPI:
     """Create and configure the video library FastAPI application.
 
     Args:
         store: Optional VideoStore instance for dependency injection (testing)
+        view_flush_interval: Seconds between batched writes of recorded views
 
     Returns:
         Configured FastAPI application
     """
-    app = FastAPI(title="MS2 QBank Video Library API", version="1.0.0")
-
     # Initialize video store
     video_store = store or VideoStore()
+    view_counts = ViewCountBuffer(video_store, flush_interval=view_flush_interval)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Startup
+        await view_counts.start()
+        yield
+        # Shutdown
+        await view_counts.shutdown()
+
+    app = FastAPI(title="MS2 QBank Video Library API", version="1.0.0", lifespan=lifespan)
+    # List responses repeat the same keys and category strings on every row,
+    # so they compress well; small single-object responses are sent as-is
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
     app.state.video_store = video_store
-
-    def get_store() -> VideoStore:
-        """Dependency to get the video store instance."""
-        return app.state.video_store
+    app.state.view_counts = view_counts
+
+    def video_dicts(videos: Iterable[Any]) -> list[dict[str, Any]]:
+        """Response dicts for videos, counting views that are not yet flushed."""
+        items = _rows_to_dicts(videos, _VIDEO_FIELDS)
+        for item in items:
+            item["view_count"] += view_counts.pending(item["id"])
+        return items
+
+    def video_response(video: VideoDB) -> VideoResponse:
+        """Response model for a video, counting views that are not yet flushed."""
+        response = _to_video_response(video)
+        response.view_count += view_counts.pending(video.id)
+        return response
 
     # ===== VIDEO ENDPOINTS =====
 
     @app.post("/videos", response_model=VideoResponse, status_code=status.HTTP_201_CREATED)
     def create_video(
+        request: Request,
         payload: VideoCreate,
-        store: VideoStore = Depends(get_store),
     ) -> VideoResponse:
         """Create a new video."""
+        store: VideoStore = request.app.state.video_store
         video = store.create_video(
             title=payload.title,
             description=payload.description,
@@ -93,161 +186,164 @@ def create_app(*, store: Optional[VideoStore] = None) -> FastAPI:
             difficulty=payload.difficulty,
             tags=payload.tags,
         )
-        return VideoResponse.model_validate(video)
+        return _to_video_response(video)
 
     @app.get("/videos", response_model=list[VideoResponse])
     def list_videos(
+        request: Request,
         subject: Optional[str] = None,
         system: Optional[str] = None,
         difficulty: Optional[str] = None,
         limit: Optional[int] = None,
-        store: VideoStore = Depends(get_store),
-    ) -> list[VideoResponse]:
+    ) -> ORJSONResponse:
         """List videos with optional filters."""
+        store: VideoStore = request.app.state.video_store
         videos = store.list_videos(
             subject=subject,
             system=system,
             difficulty=difficulty,
             limit=limit,
         )
-        return [VideoResponse.model_validate(v) for v in videos]
+        return ORJSONResponse(video_dicts(videos))
 
     @app.get("/videos/{video_id}", response_model=VideoResponse)
     def get_video(
+        request: Request,
         video_id: int,
-        store: VideoStore = Depends(get_store),
     ) -> VideoResponse:
         """Get a specific video."""
+        store: VideoStore = request.app.state.video_store
         video = store.get_video(video_id)
         if not video:
             raise HTTPException(status_code=404, detail="Video not found")
-        return VideoResponse.model_validate(video)
+        return video_response(video)
 
     @app.patch("/videos/{video_id}", response_model=VideoResponse)
     def update_video(
+        request: Request,
         video_id: int,
         payload: VideoUpdate,
-        store: VideoStore = Depends(get_store),
     ) -> VideoResponse:
         """Update a video."""
-        video = store.update_video(video_id, **payload.model_dump(exclude_unset=True))
+        store: VideoStore = request.app.state.video_store
+        # Read only the fields the client sent instead of walking the whole
+        # model as model_dump(exclude_unset=True) does
+        changes = {name: getattr(payload, name) for name in payload.model_fields_set}
+        video = store.update_video(video_id, **changes)
         if not video:
             raise HTTPException(status_code=404, detail="Video not found")
-        return VideoResponse.model_validate(video)
+        return video_response(video)
 
     @app.delete("/videos/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
     def delete_video(
+        request: Request,
         video_id: int,
-        store: VideoStore = Depends(get_store),
-    ) -> None:
+    ) -> Response:
         """Delete a video."""
+        store: VideoStore = request.app.state.video_store
         success = store.delete_video(video_id)
         if not success:
             raise HTTPException(status_code=404, detail="Video not found")
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     @app.post("/videos/{video_id}/view", status_code=status.HTTP_204_NO_CONTENT)
-    def record_view(
-        video_id: int,
-        store: VideoStore = Depends(get_store),
-    ) -> None:
-        """Record a video view."""
-        store.increment_view_count(video_id)
+    async def record_view(video_id: int) -> Response:
+        """Record a video view.
+
+        Views are buffered and written in batches, so this never waits on
+        the database.
+        """
+        view_counts.record(video_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     # ===== PLAYLIST ENDPOINTS =====
 
     @app.post("/playlists", response_model=PlaylistResponse, status_code=status.HTTP_201_CREATED)
     def create_playlist(
+        request: Request,
         payload: PlaylistCreate,
-        store: VideoStore = Depends(get_store),
         user_id: Optional[int] = Depends(optional_auth),
     ) -> PlaylistResponse:
         """Create a new playlist."""
+        store: VideoStore = request.app.state.video_store
         playlist = store.create_playlist(
             name=payload.name,
             user_id=user_id,
             description=payload.description,
         )
-        video_count = store.get_playlist_video_count(playlist.id)
-        response = PlaylistResponse.model_validate(playlist)
-        response.video_count = video_count
-        return response
+        return _to_playlist_response(playlist, store.get_playlist_video_count(playlist.id))
 
     @app.get("/playlists", response_model=list[PlaylistResponse])
     def list_playlists(
+        request: Request,
         official_only: bool = False,
-        store: VideoStore = Depends(get_store),
         user_id: Optional[int] = Depends(optional_auth),
-    ) -> list[PlaylistResponse]:
+    ) -> ORJSONResponse:
         """List playlists."""
-        playlists = store.list_playlists(user_id=user_id, official_only=official_only)
-        responses = []
-        for playlist in playlists:
-            video_count = store.get_playlist_video_count(playlist.id)
-            response = PlaylistResponse.model_validate(playlist)
-            response.video_count = video_count
-            responses.append(response)
-        return responses
+        store: VideoStore = request.app.state.video_store
+        rows = store.list_playlists_with_counts(user_id=user_id, official_only=official_only)
+        responses = _rows_to_dicts([playlist for playlist, _ in rows], _PLAYLIST_FIELDS)
+        for response, (_, video_count) in zip(responses, rows):
+            response["video_count"] = video_count
+        return ORJSONResponse(responses)
 
     @app.get("/playlists/{playlist_id}", response_model=PlaylistResponse)
     def get_playlist(
+        request: Request,
         playlist_id: int,
-        store: VideoStore = Depends(get_store),
     ) -> PlaylistResponse:
         """Get a specific playlist."""
+        store: VideoStore = request.app.state.video_store
         playlist = store.get_playlist(playlist_id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
-        video_count = store.get_playlist_video_count(playlist.id)
-        response = PlaylistResponse.model_validate(playlist)
-        response.video_count = video_count
-        return response
+        return _to_playlist_response(playlist, store.get_playlist_video_count(playlist.id))
 
     @app.patch("/playlists/{playlist_id}", response_model=PlaylistResponse)
     def update_playlist(
+        request: Request,
         playlist_id: int,
         payload: PlaylistUpdate,
-        store: VideoStore = Depends(get_store),
     ) -> PlaylistResponse:
         """Update a playlist."""
-        playlist = store.get_playlist(playlist_id)
-        if not playlist:
+        store: VideoStore = request.app.state.video_store
+        updated = store.update_playlist(
+            playlist_id,
+            name=payload.name or None,
+            description=payload.description,
+        )
+        if not updated:
             raise HTTPException(status_code=404, detail="Playlist not found")
-
-        if payload.name:
-            playlist.name = payload.name
-        if payload.description is not None:
-            playlist.description = payload.description
-
-        # Note: In a real app, we'd update via store method
-        video_count = store.get_playlist_video_count(playlist.id)
-        response = PlaylistResponse.model_validate(playlist)
-        response.video_count = video_count
-        return response
+        playlist, video_count = updated
+        return _to_playlist_response(playlist, video_count)
 
     @app.delete("/playlists/{playlist_id}", status_code=status.HTTP_204_NO_CONTENT)
     def delete_playlist(
+        request: Request,
         playlist_id: int,
-        store: VideoStore = Depends(get_store),
-    ) -> None:
+    ) -> Response:
         """Delete a playlist."""
+        store: VideoStore = request.app.state.video_store
         success = store.delete_playlist(playlist_id)
         if not success:
             raise HTTPException(status_code=404, detail="Playlist not found")
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     @app.post("/playlists/{playlist_id}/videos", status_code=status.HTTP_201_CREATED)
     def add_video_to_playlist(
+        request: Request,
         playlist_id: int,
         payload: PlaylistAddVideo,
-        store: VideoStore = Depends(get_store),
     ) -> dict:
         """Add a video to a playlist."""
+        store: VideoStore = request.app.state.video_store
         # Verify playlist and video exist
-        playlist = store.get_playlist(playlist_id)
-        if not playlist:
+        playlist_exists, video_exists = store.check_playlist_and_video_exist(
+            playlist_id, payload.video_id
+        )
+        if not playlist_exists:
             raise HTTPException(status_code=404, detail="Playlist not found")
-
-        video = store.get_video(payload.video_id)
-        if not video:
+        if not video_exists:
             raise HTTPException(status_code=404, detail="Video not found")
 
         store.add_video_to_playlist(playlist_id, payload.video_id)
@@ -255,90 +351,99 @@ def create_app(*, store: Optional[VideoStore] = None) -> FastAPI:
 
     @app.get("/playlists/{playlist_id}/videos", response_model=list[VideoResponse])
     def get_playlist_videos(
+        request: Request,
         playlist_id: int,
-        store: VideoStore = Depends(get_store),
-    ) -> list[VideoResponse]:
+    ) -> ORJSONResponse:
         """Get all videos in a playlist."""
-        videos = store.get_playlist_videos(playlist_id)
-        return [VideoResponse.model_validate(v) for v in videos]
+        store: VideoStore = request.app.state.video_store
+        rows = store.get_playlist_video_rows(playlist_id, _VIDEO_FIELDS)
+        return ORJSONResponse(video_dicts(rows))
 
     @app.delete("/playlists/{playlist_id}/videos/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
     def remove_video_from_playlist(
+        request: Request,
         playlist_id: int,
         video_id: int,
-        store: VideoStore = Depends(get_store),
-    ) -> None:
+    ) -> Response:
         """Remove a video from a playlist."""
+        store: VideoStore = request.app.state.video_store
         success = store.remove_video_from_playlist(playlist_id, video_id)
         if not success:
             raise HTTPException(status_code=404, detail="Video not in playlist")
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     # ===== PROGRESS ENDPOINTS =====
 
     @app.post("/progress", response_model=VideoProgressResponse)
     def update_progress(
+        request: Request,
         payload: VideoProgressUpdate,
-        store: VideoStore = Depends(get_store),
         user_id: int = Depends(get_current_user_id),
     ) -> VideoProgressResponse:
         """Update video progress."""
+        store: VideoStore = request.app.state.video_store
         progress = store.update_progress(
             user_id=user_id,
             video_id=payload.video_id,
             progress_seconds=payload.progress_seconds,
             completed=payload.completed,
         )
-        return VideoProgressResponse.model_validate(progress)
+        return _to_progress_response(progress)
 
     @app.get("/progress/{video_id}", response_model=VideoProgressResponse)
     def get_progress(
+        request: Request,
         video_id: int,
-        store: VideoStore = Depends(get_store),
         user_id: int = Depends(get_current_user_id),
     ) -> VideoProgressResponse:
         """Get video progress."""
+        store: VideoStore = request.app.state.video_store
         progress = store.get_progress(user_id, video_id)
         if not progress:
             raise HTTPException(status_code=404, detail="No progress found")
-        return VideoProgressResponse.model_validate(progress)
+        return _to_progress_response(progress)
 
     # ===== BOOKMARK ENDPOINTS =====
 
     @app.post("/bookmarks", response_model=BookmarkResponse, status_code=status.HTTP_201_CREATED)
     def create_bookmark(
+        request: Request,
         payload: BookmarkCreate,
-        store: VideoStore = Depends(get_store),
         user_id: int = Depends(get_current_user_id),
     ) -> BookmarkResponse:
         """Create a video bookmark."""
+        store: VideoStore = request.app.state.video_store
         bookmark = store.create_bookmark(
             user_id=user_id,
             video_id=payload.video_id,
             timestamp_seconds=payload.timestamp_seconds,
             note=payload.note,
         )
-        return BookmarkResponse.model_validate(bookmark)
+        return _to_bookmark_response(bookmark)
 
     @app.get("/videos/{video_id}/bookmarks", response_model=list[BookmarkResponse])
     def get_bookmarks(
+        request: Request,
         video_id: int,
-        store: VideoStore = Depends(get_store),
         user_id: int = Depends(get_current_user_id),
-    ) -> list[BookmarkResponse]:
+    ) -> ORJSONResponse:
         """Get all bookmarks for a video."""
+        store: VideoStore = request.app.state.video_store
         bookmarks = store.get_bookmarks(user_id, video_id)
-        return [BookmarkResponse.model_validate(b) for b in bookmarks]
+        return ORJSONResponse(_rows_to_dicts(bookmarks, _BOOKMARK_FIELDS))
 
     @app.delete("/bookmarks/{bookmark_id}", status_code=status.HTTP_204_NO_CONTENT)
     def delete_bookmark(
+        request: Request,
         bookmark_id: int,
-        store: VideoStore = Depends(get_store),
         user_id: int = Depends(get_current_user_id),
-    ) -> None:
+    ) -> Response:
         """Delete a bookmark."""
+        store: VideoStore = request.app.state.video_store
         success = store.delete_bookmark(bookmark_id, user_id)
         if not success:
             raise HTTPException(status_code=404, detail="Bookmark not found")
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     return app
 
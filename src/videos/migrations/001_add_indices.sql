@@ -29,3 +29,32 @@ CREATE INDEX IF NOT EXISTS idx_playlist_videos_order
 -- Supports queries like: "show my playlists"
 CREATE INDEX IF NOT EXISTS idx_playlist_user
     ON playlists(user_id, created_at DESC);
+
+-- Index for official playlists, newest first
+-- Supports "official playlists" and the official half of "my playlists"
+CREATE INDEX IF NOT EXISTS idx_playlist_official
+    ON playlists(is_official, created_at DESC);
+
+-- Composite indexes for the video list filters, newest first
+-- Supports queries like: "Cardiology videos for the Cardiovascular system, Hard"
+-- and "Cardiology videos, Easy". The subject prefix also serves subject-only filters
+CREATE INDEX IF NOT EXISTS idx_videos_subject_system_difficulty
+    ON videos(subject, system, difficulty, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_subject_difficulty
+    ON videos(subject, difficulty, created_at DESC);
+
+-- Index for subject-only filters and the unfiltered list, newest first
+-- Lets "latest Cardiology videos" and "latest videos" stop after LIMIT rows
+-- instead of sorting every match
+CREATE INDEX IF NOT EXISTS idx_videos_subject_time
+    ON videos(subject, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_time
+    ON videos(created_at DESC);
+
+-- The composite indexes above replace the single-column subject index
+DROP INDEX IF EXISTS ix_videos_subject;
+
+-- Index for a user's bookmarks within one video, in playback order
+-- Supports queries like: "get my bookmarks for video Y"
+CREATE INDEX IF NOT EXISTS idx_bookmark_user_video_time
+    ON video_bookmarks(user_id, video_id, timestamp_seconds);
@@ -6,8 +6,17 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field as PydanticField
+from sqlalchemy import func
 from sqlmodel import Column, DateTime, Field as SQLField, SQLModel, Text
 
+# Timestamps are filled in by SQLite within the INSERT/UPDATE statement rather
+# than by a Python callback per row. The value is UTC with millisecond
+# precision (CURRENT_TIMESTAMP has whole seconds, which would tie the
+# created_at ordering of rows written in the same second). Being a column
+# default rather than a server_default, it needs no schema change for
+# existing databases.
+_SQL_UTC_NOW = func.strftime("%Y-%m-%d %H:%M:%f", "now")
+
 
 # ===== DATABASE MODELS =====
 
@@ -25,7 +34,8 @@ class VideoDB(SQLModel, table=True):
     duration_seconds: int  # Video duration in seconds
 
     # Categorization
-    subject: str = SQLField(max_length=100, index=True)  # e.g., "Cardiology", "Anatomy"
+    # Indexed by the composite filter indexes in migrations/001_add_indices.sql
+    subject: str = SQLField(max_length=100)  # e.g., "Cardiology", "Anatomy"
     system: str = SQLField(max_length=100, index=True)  # e.g., "Cardiovascular", "Respiratory"
     topic: Optional[str] = SQLField(default=None, max_length=255)  # Specific topic
 
@@ -39,10 +49,10 @@ class VideoDB(SQLModel, table=True):
 
     # Timestamps
     created_at: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, nullable=False)
     )
     updated_at: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, onupdate=_SQL_UTC_NOW, nullable=False)
     )
 
 
@@ -59,10 +69,10 @@ class PlaylistDB(SQLModel, table=True):
 
     # Timestamps
     created_at: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, nullable=False)
     )
     updated_at: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, onupdate=_SQL_UTC_NOW, nullable=False)
     )
 
 
@@ -88,7 +98,7 @@ class VideoProgressDB(SQLModel, table=True):
     progress_seconds: int  # How far they watched
     completed: bool = SQLField(default=False)  # Finished watching
     last_watched: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, nullable=False)
     )
 
 
@@ -103,7 +113,7 @@ class VideoBookmarkDB(SQLModel, table=True):
     timestamp_seconds: int
     note: Optional[str] = SQLField(default=None, sa_column=Column(Text))
     created_at: datetime = SQLField(
-        sa_column=Column(DateTime, default=datetime.utcnow, nullable=False)
+        sa_column=Column(DateTime, default=_SQL_UTC_NOW, nullable=False)
     )
 
 
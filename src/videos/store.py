@@ -2,11 +2,16 @@
 
 from __future__ import annotations
 
+import threading
 from pathlib import Path
-from typing import Optional
+from time import monotonic
+from typing import Any, Optional, Sequence
 
-from sqlalchemy.engine import Engine
-from sqlmodel import Session, SQLModel, select
+from sqlalchemy import bindparam, case, event, exists, func, insert, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel, delete, select, update
 
 from db_utils import create_hardened_sqlite_engine, run_migrations_for_engine
 from .models import (
@@ -18,6 +23,50 @@ from .models import (
 )
 
 
+# Statements on the per-request progress and bookmark paths are built once
+# with bound parameters, so each call only binds values instead of rebuilding
+# the expression tree. SQLAlchemy's compiled cache then reuses their SQL.
+_GET_PROGRESS = select(VideoProgressDB).where(
+    (VideoProgressDB.user_id == bindparam("user_id")) & (VideoProgressDB.video_id == bindparam("video_id"))
+)
+
+_GET_BOOKMARKS = (
+    select(VideoBookmarkDB)
+    .where((VideoBookmarkDB.user_id == bindparam("user_id")) & (VideoBookmarkDB.video_id == bindparam("video_id")))
+    .order_by(VideoBookmarkDB.timestamp_seconds)
+)
+
+_progress_insert = sqlite_insert(VideoProgressDB).values(
+    user_id=bindparam("user_id"),
+    video_id=bindparam("video_id"),
+    progress_seconds=bindparam("progress_seconds"),
+    completed=bindparam("completed"),
+)
+# Without RETURNING so update_progresses can run it as one executemany
+_UPSERT_PROGRESS_MANY = _progress_insert.on_conflict_do_update(
+    index_elements=[VideoProgressDB.user_id, VideoProgressDB.video_id],
+    set_={
+        "progress_seconds": _progress_insert.excluded.progress_seconds,
+        "completed": _progress_insert.excluded.completed,
+        "last_watched": _progress_insert.excluded.last_watched,
+    },
+)
+_UPSERT_PROGRESS = _UPSERT_PROGRESS_MANY.returning(VideoProgressDB)
+
+
+def _visible_to_user(user_id: int):
+    """Filter for a user's own playlists plus the official ones.
+
+    Written as an id lookup over a UNION ALL of two index seeks instead of
+    ``user_id = ? OR is_official``, which SQLite may answer with a table scan.
+    """
+    visible_ids = union_all(
+        select(PlaylistDB.id).where(PlaylistDB.user_id == user_id),
+        select(PlaylistDB.id).where(PlaylistDB.is_official == True),
+    )
+    return PlaylistDB.id.in_(visible_ids)
+
+
 class VideoStore:
     """Manages video library persistence."""
 
@@ -32,10 +81,54 @@ class VideoStore:
             db_path = Path(database_url.replace("sqlite:///", ""))
             db_path.parent.mkdir(parents=True, exist_ok=True)
 
-        self.engine: Engine = create_hardened_sqlite_engine(database_url)
+        # Every store method checks out its own pooled connection, so the pool
+        # is sized for the request threadpool instead of the default 5 (+10
+        # overflow connections that are opened and closed on demand)
+        self.engine: Engine = create_hardened_sqlite_engine(
+            database_url,
+            pool_size=20,
+            max_overflow=0,
+            pool_pre_ping=False,
+        )
+        # Runs after the hardened engine's WAL/synchronous pragmas
+        event.listen(self.engine, "connect", self._configure_connection)
+        # Objects stay loaded after commit, so a returned object needs no
+        # follow-up SELECT once its session has committed
+        self._session_factory = sessionmaker(bind=self.engine, class_=Session, expire_on_commit=False)
         SQLModel.metadata.create_all(self.engine)
         run_migrations_for_engine(self.engine, Path(__file__).parent / "migrations")
 
+        # Cache for videos fetched by ID on every video page and playlist
+        # expansion. Writes through this store invalidate entries immediately.
+        self._video_cache: dict[int, tuple[VideoDB, float]] = {}
+        self._video_cache_ttl = 60  # seconds
+        self._video_cache_maxsize = 4096
+        self._video_cache_lock = threading.Lock()
+        # Bumped by every invalidation. A miss only caches the row it read if
+        # no invalidation happened meanwhile, so a row read just before a
+        # write commits is never cached after the write cleared it.
+        self._video_cache_generation = 0
+
+    @staticmethod
+    def _configure_connection(dbapi_connection, _) -> None:
+        """Apply memory pragmas for the video database on each new connection.
+
+        The hardened engine already enables WAL, NORMAL synchronous mode,
+        foreign keys and a busy timeout; this keeps temporary B-trees for
+        sorts and GROUP BYs in memory and serves reads of the library from a
+        memory map. The page cache is larger than the user database's since
+        list queries scan the videos table.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.execute("PRAGMA mmap_size = 268435456")  # 256 MiB
+        cursor.execute("PRAGMA cache_size = -16384")  # 16 MiB
+        cursor.close()
+
+    def _session(self) -> Session:
+        """Open a session on the store's connection pool."""
+        return self._session_factory()
+
     # ===== VIDEO OPERATIONS =====
 
     def create_video(
@@ -67,16 +160,53 @@ class VideoStore:
             tags=tags,
         )
 
-        with Session(self.engine) as session:
+        # The INSERT returns the id and SQL-generated timestamps, so the new
+        # row needs no refresh
+        with self._session() as session:
             session.add(video)
             session.commit()
-            session.refresh(video)
             return video
 
     def get_video(self, video_id: int) -> Optional[VideoDB]:
-        """Get a video by ID."""
-        with Session(self.engine) as session:
-            return session.get(VideoDB, video_id)
+        """Get a video by ID.
+
+        Results are cached for up to a minute; writes through this store
+        invalidate the cached entry immediately.
+        """
+        with self._video_cache_lock:
+            cached = self._video_cache.get(video_id)
+            generation = self._video_cache_generation
+        now = monotonic()
+        if cached is not None and now - cached[1] < self._video_cache_ttl:
+            return cached[0]
+
+        with self._session() as session:
+            video = session.get(VideoDB, video_id)
+
+        if video is not None:
+            with self._video_cache_lock:
+                # Not cached if an invalidation ran since the read: the row
+                # may predate that write
+                if generation == self._video_cache_generation:
+                    if video_id not in self._video_cache and len(self._video_cache) >= self._video_cache_maxsize:
+                        # Evict the oldest entry (dicts preserve insertion order)
+                        self._video_cache.pop(next(iter(self._video_cache)))
+                    self._video_cache[video_id] = (video, now)
+        return video
+
+    def clear_video_cache(self, *video_ids: int) -> None:
+        """Clear cached videos.
+
+        Args:
+            video_ids: Videos to drop from the cache. If none are given,
+                the entire cache is cleared.
+        """
+        with self._video_cache_lock:
+            self._video_cache_generation += 1
+            if not video_ids:
+                self._video_cache.clear()
+            for video_id in video_ids:
+                self._video_cache.pop(video_id, None)
 
     def list_videos(
         self,
@@ -86,7 +216,7 @@ class VideoStore:
         limit: Optional[int] = None,
     ) -> list[VideoDB]:
         """List videos with optional filters."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             statement = select(VideoDB)
 
             if subject:
@@ -104,40 +234,62 @@ class VideoStore:
             return list(session.exec(statement).all())
 
     def update_video(self, video_id: int, **kwargs) -> Optional[VideoDB]:
-        """Update a video."""
-        with Session(self.engine) as session:
-            video = session.get(VideoDB, video_id)
-            if not video:
-                return None
+        """Update a video.
 
-            for key, value in kwargs.items():
-                if value is not None and hasattr(video, key):
-                    setattr(video, key, value)
-
-            session.add(video)
+        The changed columns are written and the updated row, including the
+        SQL-maintained updated_at, is read back by one UPDATE ... RETURNING
+        statement. None values and unknown fields are ignored. Returns None
+        if the video does not exist.
+        """
+        columns = VideoDB.__table__.columns
+        values = {key: value for key, value in kwargs.items() if value is not None and key in columns}
+        if values:
+            statement = update(VideoDB).where(VideoDB.id == video_id).values(**values).returning(VideoDB)
+        else:
+            statement = select(VideoDB).where(VideoDB.id == video_id)
+
+        with self._session() as session:
+            video = session.scalars(statement).first()
             session.commit()
-            session.refresh(video)
-            return video
+        self.clear_video_cache(video_id)
+        return video
 
     def delete_video(self, video_id: int) -> bool:
-        """Delete a video."""
-        with Session(self.engine) as session:
-            video = session.get(VideoDB, video_id)
-            if not video:
+        """Delete a video with its playlist entries, progress and bookmarks."""
+        with self._session() as session:
+            # Rows referencing the video go first so foreign keys stay satisfied
+            for model in (PlaylistVideoDB, VideoProgressDB, VideoBookmarkDB):
+                session.exec(delete(model).where(model.video_id == video_id))
+            deleted = session.exec(delete(VideoDB).where(VideoDB.id == video_id)).rowcount
+            if not deleted:
+                session.rollback()
                 return False
-
-            session.delete(video)
             session.commit()
-            return True
+        self.clear_video_cache(video_id)
+        return True
 
     def increment_view_count(self, video_id: int) -> None:
         """Increment the view count for a video."""
-        with Session(self.engine) as session:
-            video = session.get(VideoDB, video_id)
-            if video:
-                video.view_count += 1
-                session.add(video)
-                session.commit()
+        self.add_view_counts({video_id: 1})
+
+    def add_view_counts(self, deltas: dict[int, int]) -> None:
+        """Add buffered view counts to several videos with one UPDATE.
+
+        Args:
+            deltas: Number of views to add, keyed by video ID. Unknown IDs
+                are ignored.
+        """
+        if not deltas:
+            return
+        with self._session() as session:
+            session.exec(
+                update(VideoDB)
+                .where(VideoDB.id.in_(deltas))
+                .values(view_count=VideoDB.view_count + case(deltas, value=VideoDB.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+        self.clear_video_cache(*deltas)
 
     # ===== PLAYLIST OPERATIONS =====
 
@@ -156,58 +308,132 @@ class VideoStore:
             is_official=is_official,
         )
 
-        with Session(self.engine) as session:
+        with self._session() as session:
             session.add(playlist)
             session.commit()
-            session.refresh(playlist)
             return playlist
 
     def get_playlist(self, playlist_id: int) -> Optional[PlaylistDB]:
         """Get a playlist by ID."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             return session.get(PlaylistDB, playlist_id)
 
+    def update_playlist(
+        self,
+        playlist_id: int,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+    ) -> Optional[tuple[PlaylistDB, int]]:
+        """Update a playlist and return it with its video count.
+
+        The update, the updated row and the count come back from a single
+        UPDATE ... RETURNING statement. Fields left as None are unchanged.
+        Returns None if the playlist does not exist.
+        """
+        values = {}
+        if name is not None:
+            values["name"] = name
+        if description is not None:
+            values["description"] = description
+
+        video_count = (
+            select(func.count())
+            .where(PlaylistVideoDB.playlist_id == PlaylistDB.id)
+            .scalar_subquery()
+        )
+        if values:
+            statement = (
+                update(PlaylistDB)
+                .where(PlaylistDB.id == playlist_id)
+                .values(**values)
+                .returning(PlaylistDB, video_count)
+            )
+        else:
+            statement = select(PlaylistDB, video_count).where(PlaylistDB.id == playlist_id)
+
+        with self._session() as session:
+            row = session.exec(statement).first()
+            session.commit()
+        return (row[0], row[1]) if row else None
+
     def list_playlists(self, user_id: Optional[int] = None, official_only: bool = False) -> list[PlaylistDB]:
         """List playlists."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             statement = select(PlaylistDB)
 
             if official_only:
                 statement = statement.where(PlaylistDB.is_official == True)
             elif user_id is not None:
-                statement = statement.where(
-                    (PlaylistDB.user_id == user_id) | (PlaylistDB.is_official == True)
-                )
+                statement = statement.where(_visible_to_user(user_id))
 
             statement = statement.order_by(PlaylistDB.created_at.desc())
             return list(session.exec(statement).all())
 
-    def add_video_to_playlist(self, playlist_id: int, video_id: int) -> PlaylistVideoDB:
-        """Add a video to a playlist."""
-        with Session(self.engine) as session:
-            # Get current max position
-            statement = (
-                select(PlaylistVideoDB)
-                .where(PlaylistVideoDB.playlist_id == playlist_id)
-                .order_by(PlaylistVideoDB.position.desc())
+    def check_playlist_and_video_exist(self, playlist_id: int, video_id: int) -> tuple[bool, bool]:
+        """Check whether a playlist and a video exist with one query."""
+        with self._session() as session:
+            statement = select(
+                exists().where(PlaylistDB.id == playlist_id),
+                exists().where(VideoDB.id == video_id),
             )
-            last_item = session.exec(statement).first()
-            position = (last_item.position + 1) if last_item else 0
+            playlist_exists, video_exists = session.exec(statement).one()
+            return bool(playlist_exists), bool(video_exists)
+
+    @staticmethod
+    def _next_playlist_position(playlist_id: int):
+        """SQL expression for the position after a playlist's last video (0 when empty)."""
+        return (
+            select(func.coalesce(func.max(PlaylistVideoDB.position), -1) + 1)
+            .where(PlaylistVideoDB.playlist_id == playlist_id)
+            .scalar_subquery()
+        )
+
+    def add_video_to_playlist(self, playlist_id: int, video_id: int) -> PlaylistVideoDB:
+        """Add a video to a playlist.
 
-            playlist_video = PlaylistVideoDB(
+        The next position is computed inside the INSERT and returned by it,
+        so appending is a single statement.
+        """
+        statement = (
+            insert(PlaylistVideoDB)
+            .values(
                 playlist_id=playlist_id,
                 video_id=video_id,
-                position=position,
+                position=self._next_playlist_position(playlist_id),
             )
-
-            session.add(playlist_video)
+            .returning(PlaylistVideoDB)
+        )
+        with self._session() as session:
+            playlist_video = session.exec(statement).scalars().one()
             session.commit()
-            session.refresh(playlist_video)
             return playlist_video
 
+    def add_videos_to_playlist(self, playlist_id: int, video_ids: list[int]) -> int:
+        """Append several videos to a playlist, in order, in one transaction.
+
+        The rows are written with a single multi-row INSERT and one commit
+        instead of a position lookup, INSERT and commit per video.
+
+        Returns:
+            Number of videos added
+        """
+        if not video_ids:
+            return 0
+        with self._session() as session:
+            start = session.scalar(select(self._next_playlist_position(playlist_id)))
+            session.execute(
+                insert(PlaylistVideoDB),
+                [
+                    {"playlist_id": playlist_id, "video_id": video_id, "position": start + offset}
+                    for offset, video_id in enumerate(video_ids)
+                ],
+            )
+            session.commit()
+        return len(video_ids)
+
     def get_playlist_videos(self, playlist_id: int) -> list[VideoDB]:
         """Get all videos in a playlist in order."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             statement = (
                 select(VideoDB)
                 .join(PlaylistVideoDB, VideoDB.id == PlaylistVideoDB.video_id)
@@ -216,15 +442,85 @@ class VideoStore:
             )
             return list(session.exec(statement).all())
 
+    def get_playlist_video_rows(self, playlist_id: int, fields: Sequence[str]) -> list[Row[Any]]:
+        """Get selected columns of the videos in a playlist, in order.
+
+        Returns plain Core rows instead of VideoDB objects, skipping identity
+        map and attribute instrumentation for read-only rendering. Columns are
+        available as row attributes.
+
+        Args:
+            playlist_id: Playlist whose videos to read
+            fields: Names of the videos columns to select
+        """
+        columns = VideoDB.__table__.columns
+        statement = (
+            select(*(columns[name] for name in fields))
+            .join(PlaylistVideoDB, columns["id"] == PlaylistVideoDB.video_id)
+            .where(PlaylistVideoDB.playlist_id == playlist_id)
+            .order_by(PlaylistVideoDB.position)
+        )
+        with self._session() as session:
+            return list(session.exec(statement).all())
+
     def get_playlist_video_count(self, playlist_id: int) -> int:
         """Get the number of videos in a playlist."""
-        with Session(self.engine) as session:
-            statement = select(PlaylistVideoDB).where(PlaylistVideoDB.playlist_id == playlist_id)
-            return len(list(session.exec(statement).all()))
+        with self._session() as session:
+            statement = (
+                select(func.count())
+                .select_from(PlaylistVideoDB)
+                .where(PlaylistVideoDB.playlist_id == playlist_id)
+            )
+            return session.exec(statement).one()
+
+    def list_playlists_with_counts(
+        self, user_id: Optional[int] = None, official_only: bool = False
+    ) -> list[tuple[PlaylistDB, int]]:
+        """List playlists together with their video counts.
+
+        The counts come from an outer join grouped by playlist, so the whole
+        listing is a single query and empty playlists report zero.
+
+        Args:
+            user_id: Include this user's playlists alongside official ones
+            official_only: Only include official playlists
+
+        Returns:
+            (playlist, video_count) pairs, newest playlist first
+        """
+        with self._session() as session:
+            statement = (
+                select(PlaylistDB, func.count(PlaylistVideoDB.id))
+                .outerjoin(PlaylistVideoDB, PlaylistVideoDB.playlist_id == PlaylistDB.id)
+                .group_by(PlaylistDB.id)
+            )
+
+            if official_only:
+                statement = statement.where(PlaylistDB.is_official == True)
+            elif user_id is not None:
+                statement = statement.where(_visible_to_user(user_id))
+
+            statement = statement.order_by(PlaylistDB.created_at.desc())
+            return [(playlist, count) for playlist, count in session.exec(statement).all()]
+
+    def get_playlist_video_counts(self, playlist_ids: list[int]) -> dict[int, int]:
+        """Get video counts for several playlists with one grouped query.
+
+        Playlists without videos are absent from the result.
+        """
+        if not playlist_ids:
+            return {}
+        with self._session() as session:
+            statement = (
+                select(PlaylistVideoDB.playlist_id, func.count())
+                .where(PlaylistVideoDB.playlist_id.in_(playlist_ids))
+                .group_by(PlaylistVideoDB.playlist_id)
+            )
+            return dict(session.exec(statement).all())
 
     def remove_video_from_playlist(self, playlist_id: int, video_id: int) -> bool:
         """Remove a video from a playlist."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             statement = select(PlaylistVideoDB).where(
                 (PlaylistVideoDB.playlist_id == playlist_id) & (PlaylistVideoDB.video_id == video_id)
             )
@@ -239,19 +535,13 @@ class VideoStore:
 
     def delete_playlist(self, playlist_id: int) -> bool:
         """Delete a playlist and all its associations."""
-        with Session(self.engine) as session:
-            playlist = session.get(PlaylistDB, playlist_id)
-            if not playlist:
-                return False
-
-            # Delete all playlist-video associations
-            statement = select(PlaylistVideoDB).where(PlaylistVideoDB.playlist_id == playlist_id)
-            for pv in session.exec(statement).all():
-                session.delete(pv)
-
-            session.delete(playlist)
+        with self._session() as session:
+            # Delete all playlist-video associations, then the playlist, with
+            # one statement each instead of loading and deleting every row
+            session.exec(delete(PlaylistVideoDB).where(PlaylistVideoDB.playlist_id == playlist_id))
+            deleted = session.exec(delete(PlaylistDB).where(PlaylistDB.id == playlist_id)).rowcount
             session.commit()
-            return True
+            return deleted > 0
 
     # ===== VIDEO PROGRESS OPERATIONS =====
 
@@ -262,36 +552,45 @@ class VideoStore:
         progress_seconds: int,
         completed: bool = False,
     ) -> VideoProgressDB:
-        """Update or create video progress."""
-        with Session(self.engine) as session:
-            statement = select(VideoProgressDB).where(
-                (VideoProgressDB.user_id == user_id) & (VideoProgressDB.video_id == video_id)
-            )
-            progress = session.exec(statement).first()
-
-            if progress:
-                progress.progress_seconds = progress_seconds
-                progress.completed = completed
-            else:
-                progress = VideoProgressDB(
-                    user_id=user_id,
-                    video_id=video_id,
-                    progress_seconds=progress_seconds,
-                    completed=completed,
-                )
-
-            session.add(progress)
+        """Update or create video progress.
+
+        Runs as one UPSERT on the unique (user_id, video_id) index, so there
+        is no read-modify-write race between concurrent progress updates.
+        """
+        params = {
+            "user_id": user_id,
+            "video_id": video_id,
+            "progress_seconds": progress_seconds,
+            "completed": completed,
+        }
+        with self._session() as session:
+            progress = session.exec(_UPSERT_PROGRESS, params=params).scalars().one()
             session.commit()
-            session.refresh(progress)
             return progress
 
+    def update_progresses(self, updates: list[dict[str, Any]]) -> int:
+        """Upsert progress for many (user, video) pairs in one transaction.
+
+        Each update is a dict with ``user_id``, ``video_id``,
+        ``progress_seconds`` and optionally ``completed``. All rows go through
+        the same UPSERT as :meth:`update_progress` with one executemany and a
+        single commit; later entries for the same pair win.
+
+        Returns:
+            Number of progress updates written
+        """
+        if not updates:
+            return 0
+        params = [{"completed": False, **update} for update in updates]
+        with self._session() as session:
+            session.execute(_UPSERT_PROGRESS_MANY, params)
+            session.commit()
+        return len(params)
+
     def get_progress(self, user_id: int, video_id: int) -> Optional[VideoProgressDB]:
         """Get user's progress for a specific video."""
-        with Session(self.engine) as session:
-            statement = select(VideoProgressDB).where(
-                (VideoProgressDB.user_id == user_id) & (VideoProgressDB.video_id == video_id)
-            )
-            return session.exec(statement).first()
+        with self._session() as session:
+            return session.exec(_GET_PROGRESS, params={"user_id": user_id, "video_id": video_id}).first()
 
     # ===== BOOKMARK OPERATIONS =====
 
@@ -310,25 +609,37 @@ class VideoStore:
             note=note,
         )
 
-        with Session(self.engine) as session:
+        with self._session() as session:
             session.add(bookmark)
             session.commit()
-            session.refresh(bookmark)
             return bookmark
 
+    def create_bookmarks(self, bookmarks: list[dict[str, Any]]) -> int:
+        """Create many bookmarks with one multi-row INSERT and one commit.
+
+        Each bookmark is a dict with ``user_id``, ``video_id``,
+        ``timestamp_seconds`` and optionally ``note``.
+
+        Returns:
+            Number of bookmarks created
+        """
+        if not bookmarks:
+            return 0
+        rows = [{"note": None, **bookmark} for bookmark in bookmarks]
+        with self._session() as session:
+            session.execute(insert(VideoBookmarkDB), rows)
+            session.commit()
+        return len(rows)
+
     def get_bookmarks(self, user_id: int, video_id: int) -> list[VideoBookmarkDB]:
         """Get all bookmarks for a video."""
-        with Session(self.engine) as session:
-            statement = (
-                select(VideoBookmarkDB)
-                .where((VideoBookmarkDB.user_id == user_id) & (VideoBookmarkDB.video_id == video_id))
-                .order_by(VideoBookmarkDB.timestamp_seconds)
-            )
-            return list(session.exec(statement).all())
+        with self._session() as session:
+            params = {"user_id": user_id, "video_id": video_id}
+            return list(session.exec(_GET_BOOKMARKS, params=params).all())
 
     def delete_bookmark(self, bookmark_id: int, user_id: int) -> bool:
         """Delete a bookmark."""
-        with Session(self.engine) as session:
+        with self._session() as session:
             statement = select(VideoBookmarkDB).where(
                 (VideoBookmarkDB.id == bookmark_id) & (VideoBookmarkDB.user_id == user_id)
             )
@@ -0,0 +1,85 @@
+"""Coalesce video view increments into periodic batched writes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .store import VideoStore
+
+
+class ViewCountBuffer:
+    """Buffer video views in memory and write them in one UPDATE per interval.
+
+    Recording a view only bumps an in-process counter. A background task
+    started by :meth:`start` flushes all buffered counts every
+    ``flush_interval`` seconds, and :meth:`shutdown` flushes whatever is
+    left. Counts are removed from the buffer only after they are written,
+    so a failed flush is retried on the next cycle.
+    """
+
+    def __init__(self, store: VideoStore, *, flush_interval: float = 2.0) -> None:
+        self._store = store
+        self._flush_interval = flush_interval
+        self._pending: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def record(self, video_id: int) -> None:
+        """Count one view of a video."""
+        with self._lock:
+            self._pending[video_id] = self._pending.get(video_id, 0) + 1
+
+    def pending(self, video_id: int) -> int:
+        """Return the views recorded for a video but not yet written."""
+        return self._pending.get(video_id, 0)
+
+    def flush(self) -> int:
+        """Write all buffered views to the store.
+
+        Returns:
+            Number of videos whose counts were written
+        """
+        with self._flush_lock:
+            with self._lock:
+                deltas = dict(self._pending)
+            if not deltas:
+                return 0
+            self._store.add_view_counts(deltas)
+            with self._lock:
+                for video_id, count in deltas.items():
+                    remaining = self._pending[video_id] - count
+                    if remaining:
+                        self._pending[video_id] = remaining
+                    else:
+                        del self._pending[video_id]
+            return len(deltas)
+
+    async def start(self) -> None:
+        """Start flushing buffered views in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def shutdown(self) -> None:
+        """Stop the background task and write any remaining views."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:  # pragma: no cover - defensive logging
+                logging.exception("Failed to flush buffered video views")
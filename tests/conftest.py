@@ -1,26 +1,52 @@
 from __future__ import annotations
 
-import json
+import copy
 import sys
 from pathlib import Path
-import sys
 from typing import List
 
-ROOT_DIR = Path(__file__).resolve().parents[1]
-SRC_DIR = ROOT_DIR / "src"
-if str(SRC_DIR) not in sys.path:
-    sys.path.insert(0, str(SRC_DIR))
-
-import pytest
-
-
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 SRC_PATH = PROJECT_ROOT / "src"
 if str(SRC_PATH) not in sys.path:
     sys.path.insert(0, str(SRC_PATH))
 
-@pytest.fixture
-def sample_questions() -> List[dict]:
+import orjson
+import pytest
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+
+
+@pytest.fixture(scope="session")
+def sample_questions_raw() -> List[dict]:
+    """Parse the sample question bank once per test session.
+
+    Shared by every test, so it must not be mutated; use ``sample_questions``.
+    """
     data_path = PROJECT_ROOT / "data" / "questions" / "sample_questions.json"
-    with data_path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return orjson.loads(data_path.read_bytes())
+
+
+@pytest.fixture
+def sample_questions(sample_questions_raw: List[dict]) -> List[dict]:
+    """Return a private copy of the sample questions for one test."""
+    return copy.deepcopy(sample_questions_raw)
+
+
+@pytest.fixture(scope="session")
+def reset_tables():
+    """Return a function that deletes every row from an engine's tables.
+
+    Lets a module build a store's schema once and share the store across its
+    tests, clearing data between them instead of creating a new database
+    file and running DDL for every test.
+    """
+
+    def reset(engine) -> None:
+        existing = set(inspect(engine).get_table_names())
+        with engine.begin() as conn:
+            # Children before parents so foreign keys stay satisfied
+            for table in reversed(SQLModel.metadata.sorted_tables):
+                if table.name in existing:
+                    conn.execute(table.delete())
+
+    return reset
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import functools
 from datetime import datetime, timedelta, timezone
 import logging
 from typing import Dict, List
 
 import jwt
+import orjson
+import pytest
 from fastapi.testclient import TestClient
 
 from analytics.scheduler import AnalyticsRefreshScheduler
@@ -19,24 +21,64 @@ from reviews.app import create_app
 JWT_SECRET = "analytics-test-secret"
 
 
+@pytest.fixture(scope="module")
+def search_client():
+    """Search API client shared by the module.
+
+    Starting the app builds the question search index, so it is done once;
+    the analytics endpoints read ``ANALYTICS_DIRECTORY`` per request, so tests
+    can still point it at their own directory.
+    """
+    with TestClient(search_app.app) as client:
+        yield client
+
+
+def _compact_timestamp(moment: datetime) -> str:
+    """Artifact basename for a UTC moment, e.g. ``20240203T040506Z``."""
+    return (
+        f"{moment.year:04d}{moment.month:02d}{moment.day:02d}"
+        f"T{moment.hour:02d}{moment.minute:02d}{moment.second:02d}Z"
+    )
+
+
+def _iso_timestamp(moment: datetime) -> str:
+    """``generated_at`` value for a UTC moment, e.g. ``2024-02-03T04:05:06Z``."""
+    return (
+        f"{moment.year:04d}-{moment.month:02d}-{moment.day:02d}"
+        f"T{moment.hour:02d}:{moment.minute:02d}:{moment.second:02d}Z"
+    )
+
+
+@pytest.fixture(scope="module")
+def fresh_stamps() -> tuple[str, str]:
+    """Artifact basename and ``generated_at`` for a snapshot taken as the module starts."""
+    now = datetime.now(timezone.utc)
+    return _compact_timestamp(now), _iso_timestamp(now)
+
+
 def _write_artifact(directory, basename: str, metrics: Dict[str, object], generated_at: str) -> None:
     payload = {"generated_at": generated_at, "metrics": metrics}
     json_path = directory / f"{basename}.json"
-    json_path.write_text(json.dumps(payload), encoding="utf-8")
+    json_path.write_bytes(orjson.dumps(payload))
     markdown_path = directory / f"{basename}.md"
     markdown_path.write_text("# metrics\n", encoding="utf-8")
 
 
+@functools.lru_cache(maxsize=32)
+def _encode_token(identity: str, roles: tuple[str, ...]) -> str:
+    # The tokens carry no exp claim, so one per identity and role set is reusable
+    return jwt.encode({"sub": identity, "roles": list(roles)}, JWT_SECRET, algorithm="HS256")
+
+
 def _issue_token(identity: str = "analytics-tester", roles: List[str] | None = None) -> str:
-    payload = {"sub": identity, "roles": roles or ["admin"]}
-    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+    return _encode_token(identity, tuple(roles or ("admin",)))
 
 
 def _auth_headers(identity: str = "analytics-tester", roles: List[str] | None = None) -> Dict[str, str]:
     return {"Authorization": f"Bearer {_issue_token(identity, roles)}"}
 
 
-def test_latest_analytics_endpoint_returns_latest(tmp_path, monkeypatch):
+def test_latest_analytics_endpoint_returns_latest(tmp_path, monkeypatch, search_client):
     artifact_dir = tmp_path / "analytics"
     artifact_dir.mkdir()
 
@@ -72,11 +114,10 @@ def test_latest_analytics_endpoint_returns_latest(tmp_path, monkeypatch):
 
     monkeypatch.setattr(search_app, "ANALYTICS_DIRECTORY", artifact_dir)
 
-    with TestClient(search_app.app) as client:
-        response = client.get("/analytics/latest")
+    response = search_client.get("/analytics/latest")
 
     assert response.status_code == 200
-    payload = response.json()
+    payload = orjson.loads(response.content)
     assert payload["generated_at"] == "2024-02-03T04:05:06Z"
     assert payload["artifact"]["json_path"] == "20240203T040506Z.json"
     assert payload["artifact"]["markdown_path"] == "20240203T040506Z.md"
@@ -95,18 +136,17 @@ def test_latest_analytics_endpoint_returns_latest(tmp_path, monkeypatch):
     assert usage_summary["usage_distribution"] == [{"deliveries": 3, "questions": 5}]
 
 
-def test_latest_analytics_endpoint_returns_404_when_missing(tmp_path, monkeypatch):
+def test_latest_analytics_endpoint_returns_404_when_missing(tmp_path, monkeypatch, search_client):
     artifact_dir = tmp_path / "analytics"
     artifact_dir.mkdir()
     monkeypatch.setattr(search_app, "ANALYTICS_DIRECTORY", artifact_dir)
 
-    with TestClient(search_app.app) as client:
-        response = client.get("/analytics/latest")
+    response = search_client.get("/analytics/latest")
 
     assert response.status_code == 404
 
 
-def test_latest_analytics_marks_fresh_when_recent(tmp_path, monkeypatch):
+def test_latest_analytics_marks_fresh_when_recent(tmp_path, monkeypatch, search_client, fresh_stamps):
     artifact_dir = tmp_path / "analytics"
     artifact_dir.mkdir()
 
@@ -123,30 +163,27 @@ def test_latest_analytics_marks_fresh_when_recent(tmp_path, monkeypatch):
             "usage_distribution": {"1": 1},
         },
     }
-    now = datetime.now(timezone.utc)
-    timestamp = now.strftime("%Y%m%dT%H%M%SZ")
-    _write_artifact(artifact_dir, timestamp, metrics, now.isoformat().replace("+00:00", "Z"))
+    timestamp, generated_at = fresh_stamps
+    _write_artifact(artifact_dir, timestamp, metrics, generated_at)
 
     monkeypatch.setattr(search_app, "ANALYTICS_DIRECTORY", artifact_dir)
 
-    with TestClient(search_app.app) as client:
-        response = client.get("/analytics/latest")
+    response = search_client.get("/analytics/latest")
 
     assert response.status_code == 200
-    payload = response.json()
+    payload = orjson.loads(response.content)
     assert payload["is_fresh"] is True
 
 
-def test_analytics_health_endpoint_reports_fresh_snapshot(tmp_path):
+def test_analytics_health_endpoint_reports_fresh_snapshot(tmp_path, fresh_stamps):
     artifact_dir = tmp_path / "analytics"
     artifact_dir.mkdir()
     questions_dir = tmp_path / "questions"
     questions_dir.mkdir()
 
     metrics = _default_metrics_payload()
-    now = datetime.now(timezone.utc).replace(microsecond=0)
-    timestamp = now.strftime("%Y%m%dT%H%M%SZ")
-    _write_artifact(artifact_dir, timestamp, metrics, now.isoformat().replace("+00:00", "Z"))
+    timestamp, generated_at = fresh_stamps
+    _write_artifact(artifact_dir, timestamp, metrics, generated_at)
 
     scheduler = AnalyticsRefreshScheduler(
         data_dir=questions_dir,
@@ -159,16 +196,16 @@ def test_analytics_health_endpoint_reports_fresh_snapshot(tmp_path):
         artifact_dir=artifact_dir,
         check_interval=timedelta(seconds=1),
     )
-    store = ReviewStore(tmp_path / "reviews.db")
+    store = ReviewStore(":memory:", audit_log_path=tmp_path / "audit.log")
     app = create_app(store, jwt_secret=JWT_SECRET, analytics_service=service)
 
     with TestClient(app) as client:
         response = client.get("/analytics/health", headers=_auth_headers())
 
     assert response.status_code == 200
-    payload = response.json()
+    payload = orjson.loads(response.content)
     assert payload["is_fresh"] is True
-    assert payload["generated_at"] == now.isoformat().replace("+00:00", "Z")
+    assert payload["generated_at"] == generated_at
 
 
 def test_analytics_service_warns_when_snapshot_stale(tmp_path, caplog):
@@ -182,12 +219,11 @@ async def _assert_stale_warning(tmp_path, caplog) -> None:
     questions_dir.mkdir()
 
     stale_time = datetime.now(timezone.utc) - timedelta(minutes=30)
-    timestamp = stale_time.strftime("%Y%m%dT%H%M%SZ")
     _write_artifact(
         artifact_dir,
-        timestamp,
+        _compact_timestamp(stale_time),
         _default_metrics_payload(),
-        stale_time.isoformat().replace("+00:00", "Z"),
+        _iso_timestamp(stale_time),
     )
 
     scheduler = AnalyticsRefreshScheduler(
@@ -205,26 +241,33 @@ async def _assert_stale_warning(tmp_path, caplog) -> None:
 
     caplog.set_level(logging.WARNING)
 
+    def stale_warning_logged() -> bool:
+        return any(
+            record.levelno >= logging.WARNING and "Analytics snapshot is stale" in record.message
+            for record in caplog.records
+        )
+
     await service.start()
     try:
-        await asyncio.sleep(0.2)
+        for _ in range(200):
+            if stale_warning_logged():
+                break
+            await asyncio.sleep(0.01)
     finally:
         await service.shutdown()
 
-    warnings = [record.message for record in caplog.records if record.levelno >= logging.WARNING]
-    assert any("Analytics snapshot is stale" in message for message in warnings)
+    assert stale_warning_logged()
 
 
 def _build_review_event(action: ReviewAction, role: ReviewerRole, comment: str) -> ReviewEvent:
     return ReviewEvent(reviewer="Tester", action=action, role=role, comment=comment)
 
 
-async def _await_scheduler_completion(scheduler: AnalyticsRefreshScheduler) -> None:
-    for _ in range(50):
-        await asyncio.sleep(0.05)
-        if scheduler.last_completed_at is not None:
-            return
-    raise AssertionError("Scheduler did not complete within timeout")
+async def _await_scheduler_completion(done: asyncio.Event) -> None:
+    try:
+        await asyncio.wait_for(done.wait(), timeout=2.5)
+    except asyncio.TimeoutError:
+        raise AssertionError("Scheduler did not complete within timeout") from None
 
 
 def _default_metrics_payload() -> Dict[str, object]:
@@ -246,7 +289,7 @@ def _default_metrics_payload() -> Dict[str, object]:
 def _write_artifacts_for_generation(artifact_dir, timestamp: str, payload: Dict[str, object]) -> None:
     json_path = artifact_dir / f"{timestamp}.json"
     markdown_path = artifact_dir / f"{timestamp}.md"
-    json_path.write_text(json.dumps(payload), encoding="utf-8")
+    json_path.write_bytes(orjson.dumps(payload))
     markdown_path.write_text("# metrics\n", encoding="utf-8")
 
 
@@ -261,16 +304,20 @@ async def _exercise_review_transition(tmp_path, monkeypatch):
     data_dir.mkdir()
 
     generated_at_times: List[str] = []
+    loop = asyncio.get_running_loop()
+    generation_done = asyncio.Event()
 
     def fake_runner(data_dir, artifact_dir, docs_markdown=None, docs_json=None):
         moment = datetime.now(timezone.utc)
-        timestamp = moment.strftime("%Y%m%dT%H%M%SZ")
+        timestamp = _compact_timestamp(moment)
         payload = {
-            "generated_at": moment.isoformat().replace("+00:00", "Z"),
+            "generated_at": _iso_timestamp(moment),
             "metrics": _default_metrics_payload(),
         }
         _write_artifacts_for_generation(artifact_dir, timestamp, payload)
         generated_at_times.append(payload["generated_at"])
+        # Runs in a worker thread, so wake the waiting test through the loop
+        loop.call_soon_threadsafe(generation_done.set)
         return {
             "timestamp": timestamp,
             "generated_at": payload["generated_at"],
@@ -290,7 +337,7 @@ async def _exercise_review_transition(tmp_path, monkeypatch):
 
     await scheduler.start()
 
-    store = ReviewStore(tmp_path / "reviews.db")
+    store = ReviewStore(":memory:", audit_log_path=tmp_path / "audit.log")
     store.set_analytics_hook(scheduler.handle_status_change)
 
     await asyncio.to_thread(
@@ -298,7 +345,9 @@ async def _exercise_review_transition(tmp_path, monkeypatch):
         "question-1",
         _build_review_event(ReviewAction.COMMENT, ReviewerRole.REVIEWER, "Initial"),
     )
-    await asyncio.sleep(0.2)
+    # A status change would have armed the debounce by the next loop iteration
+    await asyncio.sleep(0)
+    assert not scheduler.refresh_pending
     assert generated_at_times == []
 
     await asyncio.to_thread(
@@ -307,7 +356,8 @@ async def _exercise_review_transition(tmp_path, monkeypatch):
         _build_review_event(ReviewAction.APPROVE, ReviewerRole.EDITOR, "Approved"),
     )
 
-    await _await_scheduler_completion(scheduler)
+    assert scheduler.refresh_pending
+    await _await_scheduler_completion(generation_done)
 
     assert generated_at_times, "Analytics generation should have been triggered"
 
@@ -317,7 +367,7 @@ async def _exercise_review_transition(tmp_path, monkeypatch):
         response = client.get("/analytics/latest")
 
     assert response.status_code == 200
-    payload = response.json()
+    payload = orjson.loads(response.content)
     assert payload["is_fresh"] is True
 
     await scheduler.shutdown()
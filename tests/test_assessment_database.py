@@ -1,26 +1,23 @@
 """Tests for database-backed assessment store."""
 
-import tempfile
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
 import pytest
 
 
-@pytest.fixture
-def temp_db():
-    """Create a temporary database for testing."""
-    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as f:
-        db_path = Path(f.name)
-    yield f"sqlite:///{db_path}"
-    db_path.unlink(missing_ok=True)
+@pytest.fixture(scope="module")
+def shared_store(tmp_path_factory):
+    """Create one AssessmentDatabaseStore, and its schema, for the whole module."""
+    from src.assessments.db_store import AssessmentDatabaseStore
 
+    db_path = tmp_path_factory.mktemp("assessments") / "assessments.db"
+    return AssessmentDatabaseStore(db_path=str(db_path), question_count=10)
 
-@pytest.fixture
-def store(temp_db):
-    """Create an AssessmentDatabaseStore with a temporary database."""
-    from src.assessments.db_store import AssessmentDatabaseStore
 
-    return AssessmentDatabaseStore(db_path=temp_db, question_count=10)
+@pytest.fixture
+def store(shared_store, reset_tables):
+    """Provide the shared AssessmentDatabaseStore, emptied after each test."""
+    yield shared_store
+    reset_tables(shared_store.engine)
 
 
 class TestAssessmentDatabaseStore:
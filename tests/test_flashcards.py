@@ -1,30 +1,28 @@
 """Tests for flashcard system with spaced repetition."""
 
-import tempfile
 from datetime import date, timedelta
-from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 from flashcards.app import create_app
 from flashcards.spaced_repetition import ReviewState, SpacedRepetitionScheduler
 from flashcards.store import FlashcardStore
 
 
-@pytest.fixture
-def temp_db():
-    """Create a temporary database for testing."""
-    with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as f:
-        db_path = Path(f.name)
-    yield f"sqlite:///{db_path}"
-    db_path.unlink(missing_ok=True)
+@pytest.fixture(scope="module")
+def shared_store(tmp_path_factory):
+    """Create one FlashcardStore, and its schema, for the whole module."""
+    db_path = tmp_path_factory.mktemp("flashcards") / "flashcards.db"
+    return FlashcardStore(database_url=f"sqlite:///{db_path}")
 
 
 @pytest.fixture
-def store(temp_db):
-    """Create a FlashcardStore instance with temporary database."""
-    return FlashcardStore(database_url=temp_db)
+def store(shared_store, reset_tables):
+    """Provide the shared FlashcardStore, emptied after each test."""
+    yield shared_store
+    reset_tables(shared_store.engine)
 
 
 @pytest.fixture
@@ -267,15 +265,13 @@ def test_list_cards_in_deck(client):
     deck_id = deck_response.json()["id"]
 
     # Create multiple cards
-    for i in range(3):
-        client.post(
-            "/cards",
-            json={
-                "deck_id": deck_id,
-                "front": f"Question {i + 1}",
-                "back": f"Answer {i + 1}",
-            },
-        )
+    client.post(
+        "/cards/bulk",
+        json={
+            "deck_id": deck_id,
+            "cards": [{"front": f"Question {i + 1}", "back": f"Answer {i + 1}"} for i in range(3)],
+        },
+    )
 
     # List cards
     response = client.get(f"/decks/{deck_id}/cards")
@@ -284,6 +280,51 @@ def test_list_cards_in_deck(client):
     assert len(data) == 3
 
 
+def test_create_cards_bulk(client, store):
+    """Test creating several cards in one request and one transaction."""
+    deck_response = client.post(
+        "/decks",
+        json={"name": "Test Deck", "deck_type": "smart"},
+    )
+    deck_id = deck_response.json()["id"]
+
+    commits = []
+
+    def record(conn):
+        commits.append(conn)
+
+    event.listen(store.engine, "commit", record)
+    try:
+        response = client.post(
+            "/cards/bulk",
+            json={
+                "deck_id": deck_id,
+                "cards": [
+                    {"front": "Q1", "back": "A1", "hint": "H1", "tags": ["cardio"]},
+                    {"front": "Q2", "back": "A2", "source_question_id": "q-2"},
+                    {"front": "Q3", "back": "A3"},
+                ],
+            },
+        )
+    finally:
+        event.remove(store.engine, "commit", record)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert [card["front"] for card in data] == ["Q1", "Q2", "Q3"]
+    assert data[0]["hint"] == "H1"
+    assert data[0]["tags"] == ["cardio"]
+    assert data[1]["source_question_id"] == "q-2"
+    assert all(card["deck_id"] == deck_id and card["created_at"] for card in data)
+    assert len(commits) == 1
+    assert [card["id"] for card in client.get(f"/decks/{deck_id}/cards").json()] == [card["id"] for card in data]
+
+    missing = client.post("/cards/bulk", json={"deck_id": 9999, "cards": [{"front": "Q", "back": "A"}]})
+    assert missing.status_code == 404
+    empty = client.post("/cards/bulk", json={"deck_id": deck_id, "cards": []})
+    assert empty.status_code == 422
+
+
 def test_submit_review(client):
     """Test submitting a card review."""
     # Create deck and card
@@ -330,16 +371,11 @@ def test_get_due_cards(client):
     deck_id = deck_response.json()["id"]
 
     # Create cards
-    card1_response = client.post(
-        "/cards",
-        json={"deck_id": deck_id, "front": "Q1", "back": "A1"},
-    )
-    card1_id = card1_response.json()["id"]
-
-    card2_response = client.post(
-        "/cards",
-        json={"deck_id": deck_id, "front": "Q2", "back": "A2"},
+    cards_response = client.post(
+        "/cards/bulk",
+        json={"deck_id": deck_id, "cards": [{"front": "Q1", "back": "A1"}, {"front": "Q2", "back": "A2"}]},
     )
+    card1_id = cards_response.json()[0]["id"]
 
     # Initially, all cards should be due (new cards)
     response = client.get(f"/decks/{deck_id}/due")
@@ -369,13 +405,11 @@ def test_deck_statistics(client):
     deck_id = deck_response.json()["id"]
 
     # Create 5 cards
-    card_ids = []
-    for i in range(5):
-        card_response = client.post(
-            "/cards",
-            json={"deck_id": deck_id, "front": f"Q{i}", "back": f"A{i}"},
-        )
-        card_ids.append(card_response.json()["id"])
+    cards_response = client.post(
+        "/cards/bulk",
+        json={"deck_id": deck_id, "cards": [{"front": f"Q{i}", "back": f"A{i}"} for i in range(5)]},
+    )
+    card_ids = [card["id"] for card in cards_response.json()]
 
     # Review 3 cards with different qualities
     client.post("/reviews", json={"card_id": card_ids[0], "quality": 5})  # Perfect
@@ -1,13 +1,29 @@
 """Tests for user authentication service."""
 
+import hashlib
+import importlib
+import json
+import sqlite3
 import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import jwt
 import pytest
+from argon2 import PasswordHasher
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlmodel import Session, select
 
+import users.store as user_store
+from users import auth
 from users.app import create_app
-from users.models import UserCreate, UserLogin, UserUpdate
+from users.models import RefreshToken, User, UserCreate, UserLogin, UserProfile, UserUpdate
 from users.store import UserStore
 
 
@@ -264,7 +280,7 @@ def test_password_hashing(store):
 
     # Password should be hashed, not stored as plain text
     assert user.hashed_password != "SecurePass123!"
-    assert user.hashed_password.startswith("$2b$")  # bcrypt hash prefix
+    assert user.hashed_password.startswith("$argon2id$")  # argon2id hash prefix
 
 
 def test_authentication_flow(store):
@@ -512,7 +528,7 @@ def test_refresh_token_stored_in_database(client, store):
     # Verify token is in database
     db_token = store.get_refresh_token(refresh_token)
     assert db_token is not None
-    assert db_token.token == refresh_token
+    assert db_token.token_hash == hashlib.sha256(refresh_token.encode()).digest()
     assert db_token.revoked is False
 
 
@@ -563,3 +579,625 @@ def test_multiple_refresh_tokens_per_user(client):
         json={"refresh_token": refresh_token2},
     )
     assert refresh2_response.status_code == 200
+
+
+def test_rotate_refresh_token_revokes_old_and_stores_new(store):
+    """Test that rotation swaps tokens atomically and is single-use."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    store.store_refresh_token(user_id=user.id, token="old-token", expires_at=expires_at)
+
+    rotated_user = store.rotate_refresh_token("old-token", "new-token", user.id, expires_at)
+    assert rotated_user is not None
+    assert rotated_user.id == user.id
+    assert rotated_user.email == "student@example.com"
+    assert store.get_refresh_token("old-token") is None
+    assert store.get_refresh_token("new-token") is not None
+
+    # Replaying the old token must not mint another one
+    assert store.rotate_refresh_token("old-token", "other-token", user.id, expires_at) is None
+    assert store.get_refresh_token("other-token") is None
+
+
+def test_rotate_refresh_token_rolls_back_for_inactive_user(store):
+    """Test that rotation leaves the old token untouched for inactive users."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    store.store_refresh_token(user_id=user.id, token="old-token", expires_at=expires_at)
+    store.deactivate_user(user.id)
+
+    assert store.rotate_refresh_token("old-token", "new-token", user.id, expires_at) is None
+    assert store.get_refresh_token("old-token") is not None
+    assert store.get_refresh_token("new-token") is None
+
+
+def test_single_jwt_decode_per_request(client, monkeypatch):
+    """Test that authenticated endpoints verify each token exactly once."""
+    client.post(
+        "/auth/register",
+        json={
+            "email": "student@example.com",
+            "password": "SecurePass123!",
+            "full_name": "Jane Doe",
+        },
+    )
+    tokens = client.post(
+        "/auth/login",
+        json={"email": "student@example.com", "password": "SecurePass123!"},
+    ).json()
+
+    real_decode = auth._jwt.decode
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth._jwt, "decode", counting_decode)
+
+    response = client.get(
+        "/auth/me",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 200
+    assert calls == [tokens["access_token"]]
+
+    calls.clear()
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    assert calls == [tokens["refresh_token"]]
+
+
+def test_authenticate_upgrades_legacy_bcrypt_hash(store):
+    """Test that legacy bcrypt hashes are verified and rehashed with argon2id on login."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    legacy_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=12).hash("SecurePass123!")
+    with Session(store.engine) as session:
+        db_user = session.get(User, user.id)
+        db_user.hashed_password = legacy_hash
+        session.add(db_user)
+        session.commit()
+
+    authenticated = store.authenticate("student@example.com", "SecurePass123!")
+    assert authenticated is not None
+    assert authenticated.hashed_password.startswith("$argon2id$")
+    assert store.authenticate("student@example.com", "WrongPassword") is None
+    assert store.authenticate("student@example.com", "SecurePass123!") is not None
+
+
+def test_password_checks_run_without_a_checked_out_connection(store, monkeypatch):
+    """Test that no database connection is held while hashing or verifying passwords."""
+    checked_out = []
+
+    def tracking(func):
+        def wrapper(*args, **kwargs):
+            checked_out.append(store.engine.pool.checkedout())
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(user_store, "hash_password", tracking(user_store.hash_password))
+    monkeypatch.setattr(
+        user_store, "verify_and_update_password", tracking(user_store.verify_and_update_password)
+    )
+
+    with store.session() as session:
+        store.create_user(
+            UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe"),
+            session=session,
+        )
+        assert store.authenticate("student@example.com", "SecurePass123!", session=session) is not None
+
+    assert checked_out == [0, 0]
+
+
+def test_authenticate_rehashes_argon2_with_outdated_parameters(store):
+    """Test that argon2id hashes with non-current parameters are upgraded on login."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    old_hash = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2).hash("SecurePass123!")
+    with Session(store.engine) as session:
+        db_user = session.get(User, user.id)
+        db_user.hashed_password = old_hash
+        session.add(db_user)
+        session.commit()
+
+    authenticated = store.authenticate("student@example.com", "SecurePass123!")
+    assert authenticated is not None
+    assert authenticated.last_login is not None
+    assert store.get_user_by_id(user.id).hashed_password == authenticated.hashed_password
+    assert authenticated.hashed_password != old_hash
+    assert f"m={auth.ARGON2_MEMORY_COST},t={auth.ARGON2_TIME_COST}" in authenticated.hashed_password
+
+
+def test_eddsa_tokens_with_legacy_hs256_fallback(monkeypatch):
+    """Test EdDSA signing and acceptance of HS256 tokens during rollover."""
+    legacy_token = auth.create_access_token(1, "student@example.com")
+
+    private_key = Ed25519PrivateKey.generate()
+    monkeypatch.setattr(auth, "JWT_ALGORITHM", "EdDSA")
+    monkeypatch.setattr(auth, "_signer", auth._TokenSigner("EdDSA", private_key))
+    monkeypatch.setattr(auth, "_verifier", auth._PreparedKey("EdDSA", private_key.public_key()))
+    monkeypatch.setattr(auth, "JWT_ACCEPT_LEGACY_HS256", True)
+
+    token = auth.create_access_token(1, "student@example.com")
+    assert jwt.get_unverified_header(token)["alg"] == "EdDSA"
+    assert auth.get_user_id_from_token(token) == 1
+    assert auth.get_user_id_from_token(legacy_token) == 1
+
+    monkeypatch.setattr(auth, "JWT_ACCEPT_LEGACY_HS256", False)
+    auth.clear_token_cache()
+    assert auth.get_user_id_from_token(token) == 1
+    assert auth.get_user_id_from_token(legacy_token) is None
+
+
+def test_legacy_hs256_fallback_is_opt_in_and_needs_explicit_secret(monkeypatch):
+    """Test that an EdDSA verifier rejects HS256 tokens signed with the default secret."""
+    forged = auth.create_access_token(1, "student@example.com")
+    assert jwt.get_unverified_header(forged)["alg"] == "HS256"
+
+    pem = Ed25519PrivateKey.generate().private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+    monkeypatch.setenv("JWT_PRIVATE_KEY", pem.decode())
+    monkeypatch.delenv("JWT_SECRET", raising=False)
+    monkeypatch.delenv("JWT_ACCEPT_LEGACY_HS256", raising=False)
+    try:
+        importlib.reload(auth)
+        assert auth.JWT_ALGORITHM == "EdDSA"
+        assert auth.JWT_ACCEPT_LEGACY_HS256 is False
+        assert auth.get_user_id_from_token(forged) is None
+        assert auth.get_user_id_from_token(auth.create_access_token(1, "student@example.com")) == 1
+
+        monkeypatch.setenv("JWT_ACCEPT_LEGACY_HS256", "true")
+        with pytest.raises(RuntimeError, match="JWT_SECRET"):
+            importlib.reload(auth)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(auth)
+
+
+def test_precompiled_signer_matches_pyjwt_encoding():
+    """Test that the cached signer produces byte-identical tokens to jwt.encode."""
+    now = datetime.now(timezone.utc)
+    payload = {"sub": "1", "iat": now, "exp": now, "iss": auth.JWT_ISSUER}
+
+    assert auth._signer.sign(dict(payload)) == jwt.encode(
+        payload, auth.JWT_SECRET, algorithm=auth.JWT_ALGORITHM
+    )
+
+
+def test_legacy_raw_refresh_tokens_are_migrated_to_hashes(temp_db):
+    """Test that databases storing raw refresh tokens are upgraded in place."""
+    UserStore(database_url=temp_db).create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    conn = sqlite3.connect(temp_db.replace("sqlite:///", ""))
+    conn.executescript(
+        """
+        DROP TABLE refresh_tokens;
+        CREATE TABLE refresh_tokens (
+            id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, token VARCHAR(500) NOT NULL UNIQUE,
+            expires_at DATETIME NOT NULL, created_at DATETIME NOT NULL,
+            revoked BOOLEAN NOT NULL, device_info VARCHAR(500)
+        );
+        CREATE INDEX ix_refresh_tokens_user_id ON refresh_tokens (user_id);
+        """
+    )
+    conn.execute(
+        "INSERT INTO refresh_tokens VALUES (1, 1, 'legacy-token', ?, ?, 0, NULL)",
+        (expires_at.isoformat(sep=" "), datetime.now(timezone.utc).isoformat(sep=" ")),
+    )
+    conn.commit()
+    conn.close()
+
+    store = UserStore(database_url=temp_db)
+    db_token = store.get_refresh_token("legacy-token")
+    assert db_token is not None
+    assert db_token.token_hash == hashlib.sha256(b"legacy-token").digest()
+
+
+def test_issuing_refresh_token_purges_expired_tokens(store):
+    """Test that expired refresh tokens are removed when a new one is issued."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    now = datetime.now(timezone.utc)
+    store.store_refresh_token(user_id=user.id, token="expired-token", expires_at=now - timedelta(days=1))
+    store.store_refresh_token(user_id=user.id, token="live-token", expires_at=now + timedelta(days=7))
+
+    with Session(store.engine) as session:
+        hashes = set(session.exec(select(RefreshToken.token_hash)).all())
+    assert hashes == {hashlib.sha256(b"live-token").digest()}
+
+
+def test_get_user_by_id_is_cached_and_invalidated_on_write(store):
+    """Test that user lookups are served from cache until the user changes."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+
+    assert store.get_cached_user(user.id) is None
+    first = store.get_user_by_id(user.id)
+    assert store.get_user_by_id(user.id) is first
+    assert store.get_cached_user(user.id) is first
+
+    store.update_user(user.id, UserUpdate(full_name="Jane Smith"))
+    refreshed = store.get_user_by_id(user.id)
+    assert refreshed is not first
+    assert refreshed.full_name == "Jane Smith"
+
+    assert store.deactivate_user(user.id).is_active is False
+    assert store.get_user_by_id(user.id).is_active is False
+
+    store._user_cache_ttl = 0
+    assert store.get_user_by_id(user.id) is not store.get_user_by_id(user.id)
+
+
+def test_request_reuses_one_database_connection(client, store, monkeypatch):
+    """Test that a request shares one connection, and a user cache hit uses none."""
+    client.post(
+        "/auth/register",
+        json={"email": "student@example.com", "password": "SecurePass123!", "full_name": "Jane Doe"},
+    )
+    login = client.post("/auth/login", json={"email": "student@example.com", "password": "SecurePass123!"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    store.clear_user_cache()
+
+    checkouts = []
+
+    def count_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(store.engine, "checkout", count_checkout)
+    try:
+        # Cache miss in get_current_user followed by the token revocation
+        response = client.post("/auth/logout", headers=headers)
+    finally:
+        event.remove(store.engine, "checkout", count_checkout)
+
+    assert response.status_code == 204
+    assert len(checkouts) == 1
+
+    # Log in again and warm the user cache
+    login = client.post("/auth/login", json={"email": "student@example.com", "password": "SecurePass123!"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    session_threads = []
+    real_session = store.session
+
+    def tracking_session():
+        session_threads.append(threading.current_thread().name)
+        return real_session()
+
+    monkeypatch.setattr(store, "session", tracking_session)
+    checkouts.clear()
+    event.listen(store.engine, "checkout", count_checkout)
+    try:
+        response = client.get("/auth/me", headers=headers)
+    finally:
+        event.remove(store.engine, "checkout", count_checkout)
+
+    assert response.status_code == 200
+    assert checkouts == []
+    # The session dependency ran on the event loop, not in a worker thread
+    assert len(session_threads) == 1
+    assert session_threads[0] != "AnyIO worker thread"
+
+
+def test_user_profile_from_user_matches_validated_profile(store):
+    """Test that the unvalidated profile shortcut matches a validated profile."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    fields = {name: getattr(user, name) for name in UserProfile.model_fields}
+
+    assert UserProfile.from_user(user).model_dump() == UserProfile(**fields).model_dump()
+
+
+def test_profile_etag_returns_not_modified(client):
+    """Test that /auth/me answers a matching If-None-Match with 304."""
+    client.post(
+        "/auth/register",
+        json={"email": "student@example.com", "password": "SecurePass123!", "full_name": "Jane Doe"},
+    )
+    login = client.post("/auth/login", json={"email": "student@example.com", "password": "SecurePass123!"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, max-age=30"
+    etag = response.headers["etag"]
+
+    not_modified = client.get("/auth/me", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    client.patch("/auth/me", headers=headers, json={"full_name": "Jane Smith"})
+    changed = client.get("/auth/me", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["full_name"] == "Jane Smith"
+    assert changed.headers["etag"] != etag
+
+
+def test_user_id_read_from_uid_claim_with_sub_fallback():
+    """Test that tokens expose an integer uid and legacy sub-only tokens still work."""
+    token = auth.create_access_token(42, "student@example.com")
+    assert auth.decode_access_token(token)["uid"] == 42
+    assert auth.get_user_id_from_token(token) == 42
+
+    now = datetime.now(timezone.utc)
+    legacy = auth._signer.sign(
+        {
+            "sub": "7",
+            "email": "student@example.com",
+            "exp": now + timedelta(minutes=5),
+            "iat": now,
+            "nbf": now,
+            "iss": auth.JWT_ISSUER,
+            "aud": auth.JWT_AUDIENCE,
+        }
+    )
+    assert auth.get_user_id_from_token(legacy) == 7
+    assert auth.get_user_id_from_claims({"sub": "not-a-number"}) is None
+
+
+def test_issuer_and_audience_are_checked_after_decoding():
+    """Test that signed tokens for another issuer or audience are still rejected."""
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": "1",
+        "exp": now + timedelta(minutes=5),
+        "iat": now,
+        "nbf": now,
+        "iss": auth.JWT_ISSUER,
+        "aud": auth.JWT_AUDIENCE,
+    }
+
+    with pytest.raises(jwt.InvalidIssuerError):
+        auth.decode_access_token(auth._signer.sign({**claims, "iss": "someone-else"}))
+    with pytest.raises(jwt.InvalidAudienceError):
+        auth.decode_access_token(auth._signer.sign({**claims, "aud": "another-api"}))
+    with pytest.raises(jwt.MissingRequiredClaimError):
+        auth.decode_access_token(auth._signer.sign({k: v for k, v in claims.items() if k != "aud"}))
+    assert auth.get_user_id_from_token(auth._signer.sign({**claims, "iss": "someone-else"})) is None
+
+
+def test_prepared_key_rejects_forged_tokens():
+    """Test that verification with the prepared key still rejects bad signatures."""
+    token = auth.create_access_token(1, "student@example.com")
+    payload = jwt.decode(token, options={"verify_signature": False})
+    forged = jwt.encode(payload, "some-other-secret-that-is-long-enough", algorithm="HS256")
+    header, claims, signature = token.split(".")
+    tampered = f"{header}.{claims}.{signature[::-1]}"
+
+    assert auth.get_user_id_from_token(token) == 1
+    assert auth.get_user_id_from_token(forged) is None
+    assert auth.get_user_id_from_token(tampered) is None
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        auth._jwt.decode(
+            jwt.encode(payload, "x" * 64, algorithm="HS512"), auth._verifier.key, algorithms=auth._verifier.algorithms
+        )
+
+
+def test_access_token_verification_is_cached_until_expiry(monkeypatch):
+    """Test that a reused access token is verified once until it expires."""
+    auth.clear_token_cache()
+    real_decode = auth._jwt.decode
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth._jwt, "decode", counting_decode)
+
+    token = auth.create_access_token(1, "student@example.com")
+    assert auth.get_user_id_from_token(token) == 1
+    assert auth.get_user_id_from_token(token) == 1
+    assert calls == [token]
+
+    expired = auth.create_access_token(1, "student@example.com", expires_delta=timedelta(seconds=-1))
+    assert auth.get_user_id_from_token(expired) is None
+    assert auth.get_user_id_from_token(expired) is None
+    assert calls == [token, expired, expired]
+
+    # Once exp passes, the cached entry is ignored and the token is verified again
+    exp = auth.decode_access_token(token)["exp"]
+    monkeypatch.setattr(auth.time, "time", lambda: exp + 1)
+    auth.get_user_id_from_token(token)
+    assert calls == [token, expired, expired, token]
+
+
+def test_bulk_revoke_and_cleanup_report_affected_rows(store):
+    """Test that token revocation and cleanup report how many rows they touched."""
+    now = datetime.now(timezone.utc)
+    users = [
+        store.create_user(
+            UserCreate(email=f"student{i}@example.com", password="SecurePass123!", full_name="Jane Doe")
+        )
+        for i in range(2)
+    ]
+    for i in range(3):
+        store.store_refresh_token(users[0].id, f"live-{i}", now + timedelta(days=7))
+    for user in users:
+        store.store_refresh_token(user.id, f"expired-{user.id}", now - timedelta(days=1))
+
+    assert store.revoke_refresh_token("live-0") is True
+    assert store.revoke_refresh_token("unknown") is False
+    assert store.revoke_all_user_tokens(users[0].id) == 3
+    assert store.revoke_all_user_tokens(users[0].id) == 0
+    assert store.get_refresh_token("live-1") is None
+    assert store.cleanup_expired_tokens() == 2
+
+
+def test_refresh_token_indexes_are_created(store):
+    """Test that the refresh-token query indexes from the migrations exist."""
+    with store.engine.connect() as conn:
+        names = {
+            row[0]
+            for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'refresh_tokens'"
+            )
+        }
+
+    assert {
+        "idx_refresh_tokens_user_live",
+        "idx_refresh_tokens_user_expires",
+        "idx_refresh_tokens_expires",
+    } <= names
+
+
+def test_store_sessions_share_a_fixed_pool_and_keep_objects_loaded(store):
+    """Test the user store's pool sizing and that committed objects stay usable."""
+    assert store.engine.pool.size() == 20
+    assert store.engine.pool._max_overflow == 0
+
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    with store.session() as session:
+        assert session.expire_on_commit is False
+    assert user.email == "student@example.com"
+
+
+def test_authenticate_unknown_email_still_checks_a_password(store, monkeypatch):
+    """Test that logins for unknown emails run a password check like real accounts."""
+    checked = []
+    real_verify = auth.verify_password
+
+    def tracking_verify(plain_password, hashed_password):
+        checked.append(hashed_password)
+        return real_verify(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth, "verify_password", tracking_verify)
+
+    assert store.authenticate("nobody@example.com", "SecurePass123!") is None
+    assert checked == [auth._DUMMY_HASH]
+    assert checked[0].startswith("$argon2id$")
+
+
+def test_cleanup_expired_tokens_deletes_in_batches(store):
+    """Test that expired-token cleanup deletes every row across several batches."""
+    now = datetime.now(timezone.utc)
+    users = [
+        store.create_user(
+            UserCreate(email=f"student{i}@example.com", password="SecurePass123!", full_name="Jane Doe")
+        )
+        for i in range(6)
+    ]
+    store.store_refresh_token(users[0].id, "live", now + timedelta(days=7))
+    for user in users[1:]:
+        store.store_refresh_token(user.id, f"expired-{user.id}", now - timedelta(days=1))
+
+    deletes = []
+
+    def count_delete(conn, cursor, statement, *args):
+        if statement.startswith("DELETE"):
+            deletes.append(statement)
+
+    event.listen(store.engine, "before_cursor_execute", count_delete)
+    try:
+        assert store.cleanup_expired_tokens(batch_size=2) == 5
+    finally:
+        event.remove(store.engine, "before_cursor_execute", count_delete)
+
+    assert len(deletes) == 3
+    assert store.get_refresh_token("live") is not None
+
+
+def test_refresh_token_expiry_is_compared_in_sql_with_subsecond_precision(store):
+    """Test that a token is rejected as soon as it expires, not at the next whole second."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    store.store_refresh_token(user.id, "short", datetime.now(timezone.utc) + timedelta(milliseconds=50))
+    assert store.get_refresh_token("short") is not None
+
+    time.sleep(0.1)
+    assert store.get_refresh_token("short") is None
+    assert store.cleanup_expired_tokens() == 1
+
+
+def test_update_user_skips_unchanged_fields(store):
+    """Test that profile saves write only changed fields and skip no-op updates."""
+    user = store.create_user(
+        UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+    )
+    update = UserUpdate(full_name="Jane Doe", display_settings={"theme": "dark", "font_size": 14})
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE"):
+            statements.append(statement)
+
+    event.listen(store.engine, "before_cursor_execute", record)
+    try:
+        updated = store.update_user(user.id, update)
+        store.update_user(user.id, update)
+    finally:
+        event.remove(store.engine, "before_cursor_execute", record)
+
+    assert json.loads(updated.display_settings) == {"theme": "dark", "font_size": 14}
+    assert len(statements) == 1
+    assert "display_settings" in statements[0]
+    assert "full_name" not in statements[0].split("WHERE")[0]
+
+
+def test_writes_do_not_reload_rows_after_commit(store):
+    """Test that creating a user or refresh token does not re-select the new row."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(store.engine, "before_cursor_execute", record)
+    try:
+        user = store.create_user(
+            UserCreate(email="student@example.com", password="SecurePass123!", full_name="Jane Doe")
+        )
+        token = store.store_refresh_token(user.id, "token", datetime.now(timezone.utc) + timedelta(days=7))
+    finally:
+        event.remove(store.engine, "before_cursor_execute", record)
+
+    assert statements == ["SELECT", "INSERT", "DELETE", "INSERT"]
+    assert user.id is not None and user.created_at is not None
+    assert token.id is not None and token.user_id == user.id
+
+
+def test_token_time_claims_are_integer_timestamps():
+    """Test that issued tokens carry integer time claims matching the stored expiry."""
+    access = jwt.decode(auth.create_access_token(1, "student@example.com"), options={"verify_signature": False})
+    assert all(type(access[claim]) is int for claim in ("exp", "iat", "nbf"))
+    assert access["exp"] - access["iat"] == int(auth._LEGACY_TOKEN_EXPIRES.total_seconds())
+
+    token, expires_at = auth.create_refresh_token(1)
+    refresh = jwt.decode(token, options={"verify_signature": False})
+    assert refresh["exp"] == int(expires_at.timestamp())
+    assert refresh["exp"] - refresh["iat"] == int(auth.REFRESH_TOKEN_EXPIRES.total_seconds())
+
+
+def test_user_database_connections_use_wal_and_memory_pragmas(store):
+    """Test that every pooled connection has the user database pragmas applied."""
+    with store.engine.connect() as conn:
+        pragmas = {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "temp_store", "mmap_size", "cache_size")
+        }
+
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "temp_store": 2,
+        "mmap_size": 268435456,
+        "cache_size": -8000,
+    }
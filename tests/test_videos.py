@@ -1,12 +1,23 @@
 """Tests for video library service."""
 
 import tempfile
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Row
 
+from src.videos import app as video_app
 from src.videos.app import create_app
+from src.videos.models import (
+    BookmarkResponse,
+    PlaylistResponse,
+    VideoProgressResponse,
+    VideoResponse,
+)
 from src.videos.store import VideoStore
 
 
@@ -32,6 +43,40 @@ def client(store):
     return TestClient(app)
 
 
+@pytest.fixture
+def record_statements(store):
+    """Return a context manager collecting the SQL the store runs inside it."""
+
+    @contextmanager
+    def record():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(store.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(store.engine, "before_cursor_execute", before_cursor_execute)
+
+    return record
+
+
+def _create_video(store, i=1, **overrides):
+    """Create video ``i`` with default catalogue fields, overridden by keyword."""
+    fields = {
+        "title": f"Video {i}",
+        "description": "Test",
+        "video_url": f"http://example.com/{i}.mp4",
+        "duration_seconds": 300,
+        "subject": "Anatomy",
+        "system": "Cardiovascular",
+    }
+    fields.update(overrides)
+    return store.create_video(**fields)
+
+
 # ===== VIDEO TESTS =====
 
 
@@ -205,6 +250,24 @@ def test_delete_video(client):
     assert response.status_code == 404
 
 
+def test_delete_video_removes_dependent_rows(client, store):
+    """Deleting a video in a playlist with progress and bookmarks succeeds."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Playlist")
+    store.add_video_to_playlist(playlist.id, video.id)
+    store.update_progress(user_id=1, video_id=video.id, progress_seconds=30)
+    store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=10)
+
+    response = client.delete(f"/videos/{video.id}")
+    assert response.status_code == 204
+
+    assert store.get_video(video.id) is None
+    assert store.get_playlist_video_count(playlist.id) == 0
+    assert store.get_progress(user_id=1, video_id=video.id) is None
+    assert store.get_bookmarks(user_id=1, video_id=video.id) == []
+    assert client.delete(f"/videos/{video.id}").status_code == 404
+
+
 def test_record_view(client):
     """Test recording a video view."""
     # Create a video
@@ -365,3 +428,464 @@ def test_delete_playlist(client):
     # Verify it's gone
     response = client.get(f"/playlists/{playlist_id}")
     assert response.status_code == 404
+
+
+def test_list_endpoints_match_response_model_encoding(client, store):
+    """Test that orjson-rendered lists encode rows exactly as the response models would."""
+    video = _create_video(store, tags="cardio")
+    playlist = store.create_playlist(name="Cardio", description="Heart")
+    store.add_video_to_playlist(playlist.id, video.id)
+
+    expected_video = VideoResponse.model_validate(store.get_video(video.id)).model_dump(mode="json")
+    assert client.get("/videos").json() == [expected_video]
+    assert client.get(f"/playlists/{playlist.id}/videos").json() == [expected_video]
+
+    expected_playlist = PlaylistResponse.model_validate(store.get_playlist(playlist.id))
+    expected_playlist.video_count = 1
+    assert client.get("/playlists").json() == [expected_playlist.model_dump(mode="json")]
+
+
+def test_response_helpers_match_model_validate(store):
+    """Test that model_construct helpers build the same responses as model_validate."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Cardio")
+    progress = store.update_progress(user_id=1, video_id=video.id, progress_seconds=42)
+    bookmark = store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=10, note="Key point")
+
+    assert video_app._to_video_response(video) == VideoResponse.model_validate(video)
+    expected_playlist = PlaylistResponse.model_validate(playlist)
+    expected_playlist.video_count = 3
+    assert video_app._to_playlist_response(playlist, 3) == expected_playlist
+    assert video_app._to_progress_response(progress) == VideoProgressResponse.model_validate(progress)
+    assert video_app._to_bookmark_response(bookmark) == BookmarkResponse.model_validate(bookmark)
+
+
+def test_list_playlists_counts_videos_in_one_query(client, store, record_statements):
+    """Test that listing playlists and their video counts takes a single query."""
+    videos = [_create_video(store, i) for i in range(3)]
+    playlists = [store.create_playlist(name=f"Playlist {i}") for i in range(3)]
+    for video in videos:
+        store.add_video_to_playlist(playlists[0].id, video.id)
+    store.add_video_to_playlist(playlists[1].id, videos[0].id)
+
+    with record_statements() as statements:
+        response = client.get("/playlists")
+
+    assert {p["name"]: p["video_count"] for p in response.json()} == {
+        "Playlist 0": 3,
+        "Playlist 1": 1,
+        "Playlist 2": 0,
+    }
+    assert len([s for s in statements if "playlists" in s]) == 1
+
+
+def test_add_video_to_playlist_checks_existence_in_one_query(client, store, record_statements):
+    """Test that adding to a playlist verifies both ids together and reports missing ones."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Cardio")
+
+    response = client.post("/playlists/999/videos", json={"video_id": video.id})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Playlist not found"
+    response = client.post(f"/playlists/{playlist.id}/videos", json={"video_id": 999})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Video not found"
+
+    with record_statements() as statements:
+        response = client.post(f"/playlists/{playlist.id}/videos", json={"video_id": video.id})
+
+    assert response.status_code == 201
+    assert sum("EXISTS" in statement for statement in statements) == 1
+    assert not any("FROM videos" in s and "EXISTS" not in s for s in statements)
+    assert store.get_playlist_video_count(playlist.id) == 1
+
+
+def test_store_uses_fixed_connection_pool(store):
+    """Test that the video store keeps a fixed pool sized for concurrent requests."""
+    assert store.engine.pool.size() == 20
+    assert store.engine.pool._max_overflow == 0
+
+
+def test_filter_and_bookmark_queries_use_composite_indexes(store):
+    """Test that filtered video lists and bookmark lookups are served by composite indexes."""
+
+    def plan(sql):
+        with store.engine.connect() as conn:
+            return " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+    with store.engine.connect() as conn:
+        indexes = {
+            name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+    assert "ix_videos_subject" not in indexes
+
+    assert "idx_videos_subject_system_difficulty" in plan(
+        "SELECT * FROM videos WHERE subject = 'a' AND system = 'b' AND difficulty = 'c' "
+        "ORDER BY created_at DESC"
+    )
+    assert "idx_videos_subject_difficulty" in plan(
+        "SELECT * FROM videos WHERE subject = 'a' AND difficulty = 'c' ORDER BY created_at DESC"
+    )
+    for sql, index in (
+        ("SELECT * FROM videos WHERE subject = 'a' ORDER BY created_at DESC LIMIT 20", "idx_videos_subject_time"),
+        ("SELECT * FROM videos ORDER BY created_at DESC LIMIT 20", "idx_videos_time"),
+    ):
+        list_plan = plan(sql)
+        assert index in list_plan
+        assert "TEMP B-TREE" not in list_plan
+    bookmark_plan = plan(
+        "SELECT * FROM video_bookmarks WHERE user_id = 1 AND video_id = 2 ORDER BY timestamp_seconds"
+    )
+    assert "idx_bookmark_user_video_time" in bookmark_plan
+    assert "TEMP B-TREE" not in bookmark_plan
+
+
+def test_update_playlist_persists_and_returns_count_in_one_statement(client, store, record_statements):
+    """Test that a playlist PATCH is saved and answered by a single query."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Cardio", description="Heart")
+    store.add_video_to_playlist(playlist.id, video.id)
+
+    with record_statements() as statements:
+        response = client.patch(f"/playlists/{playlist.id}", json={"name": "Cardiology"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["name"], data["description"], data["video_count"]) == ("Cardiology", "Heart", 1)
+    assert len(statements) == 1
+    assert store.get_playlist(playlist.id).name == "Cardiology"
+
+    response = client.patch(f"/playlists/{playlist.id}", json={})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Cardiology"
+
+    assert client.patch("/playlists/999", json={"name": "Missing"}).status_code == 404
+    assert client.patch("/playlists/999", json={}).status_code == 404
+
+
+def test_views_are_buffered_and_flushed_in_one_update(store, record_statements):
+    """Test that recorded views are counted immediately and written in one batch."""
+    videos = [_create_video(store, i) for i in range(2)]
+    app = create_app(store=store, view_flush_interval=60)
+
+    with TestClient(app) as client:
+        with record_statements() as statements:
+            for _ in range(3):
+                client.post(f"/videos/{videos[0].id}/view")
+            client.post(f"/videos/{videos[1].id}/view")
+
+        # Not yet written, but already reflected in responses
+        assert statements == []
+        assert store.get_video(videos[0].id).view_count == 0
+        counts = {v["id"]: v["view_count"] for v in client.get("/videos").json()}
+        assert counts == {videos[0].id: 3, videos[1].id: 1}
+
+        with record_statements() as statements:
+            assert app.state.view_counts.flush() == 2
+        assert sum(statement.startswith("UPDATE") for statement in statements) == 1
+        assert client.get(f"/videos/{videos[0].id}").json()["view_count"] == 3
+
+        client.post(f"/videos/{videos[1].id}/view")
+
+    # Shutdown writes whatever is still buffered
+    assert store.get_video(videos[0].id).view_count == 3
+    assert store.get_video(videos[1].id).view_count == 2
+    assert app.state.view_counts.pending(videos[1].id) == 0
+
+
+def test_timestamps_are_filled_in_by_sql(store):
+    """Test that row timestamps come from SQL expressions, not Python-bound parameters."""
+    params = []
+
+    def record(conn, cursor, statement, parameters, *args):
+        if statement.startswith(("INSERT", "UPDATE")):
+            params.extend(parameters)
+
+    event.listen(store.engine, "before_cursor_execute", record)
+    try:
+        video = _create_video(store)
+        updated = store.update_video(video.id, title="Video 1b")
+    finally:
+        event.remove(store.engine, "before_cursor_execute", record)
+
+    assert not any(isinstance(value, datetime) for value in params)
+    assert isinstance(video.created_at, datetime)
+    assert updated.updated_at >= video.updated_at
+    assert updated.created_at == video.created_at
+
+
+def test_large_list_responses_are_gzip_compressed(client, store):
+    """Test that large list responses are compressed while small ones are not."""
+    for i in range(20):
+        _create_video(store, i)
+
+    response = client.get("/videos", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
+
+    response = client.get("/videos/1", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_store_writes_do_not_reselect_inserted_rows(store, record_statements):
+    """Test that creating rows returns usable objects without a follow-up SELECT."""
+    with record_statements() as statements:
+        video = _create_video(store)
+        bookmark = store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=10)
+
+    assert [statement.split()[0] for statement in statements] == ["INSERT", "INSERT"]
+    assert video.id is not None and video.created_at is not None and video.view_count == 0
+    assert bookmark.video_id == video.id and bookmark.created_at is not None
+
+
+def test_add_videos_to_playlist_appends_in_one_insert(store, record_statements):
+    """Test that bulk-adding videos keeps order after existing entries and commits once."""
+    videos = [_create_video(store, i) for i in range(4)]
+    playlist = store.create_playlist(name="Cardio")
+    assert store.add_video_to_playlist(playlist.id, videos[0].id).position == 0
+
+    with record_statements() as statements:
+        added = store.add_videos_to_playlist(playlist.id, [v.id for v in reversed(videos[1:])])
+
+    assert added == 3
+    assert sum(statement.startswith("INSERT") for statement in statements) == 1
+    ordered = [v.id for v in store.get_playlist_videos(playlist.id)]
+    assert ordered == [videos[0].id, videos[3].id, videos[2].id, videos[1].id]
+    assert store.add_videos_to_playlist(playlist.id, []) == 0
+
+
+def test_playlist_video_count_is_counted_in_sql(store, record_statements):
+    """Test that counting playlist videos issues COUNT(*) rather than loading rows."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Cardio")
+    store.add_videos_to_playlist(playlist.id, [video.id] * 3)
+
+    with record_statements() as statements:
+        assert store.get_playlist_video_count(playlist.id) == 3
+        assert store.get_playlist_video_count(999) == 0
+
+    assert all("count(*)" in statement for statement in statements)
+
+
+def test_delete_playlist_removes_entries_with_two_statements(store, record_statements):
+    """Test that deleting a playlist clears its entries with bulk deletes."""
+    video = _create_video(store)
+    playlist = store.create_playlist(name="Cardio")
+    store.add_videos_to_playlist(playlist.id, [video.id] * 5)
+
+    with record_statements() as statements:
+        assert store.delete_playlist(playlist.id) is True
+
+    assert [statement.split()[0] for statement in statements] == ["DELETE", "DELETE"]
+    assert store.get_playlist(playlist.id) is None
+    assert store.get_playlist_video_count(playlist.id) == 0
+    assert store.delete_playlist(playlist.id) is False
+
+
+def test_update_progress_upserts_in_one_statement(store, record_statements):
+    """Test that progress updates insert once, then update the same row in place."""
+    video = _create_video(store)
+
+    with record_statements() as statements:
+        first = store.update_progress(user_id=1, video_id=video.id, progress_seconds=30)
+        second = store.update_progress(user_id=1, video_id=video.id, progress_seconds=300, completed=True)
+
+    assert [statement.split()[0] for statement in statements] == ["INSERT", "INSERT"]
+    assert second.id == first.id
+    assert (second.progress_seconds, second.completed) == (300, True)
+    assert second.last_watched >= first.last_watched
+    stored = store.get_progress(1, video.id)
+    assert (stored.id, stored.progress_seconds, stored.completed) == (first.id, 300, True)
+
+
+def test_video_database_connections_use_wal_and_memory_pragmas(store):
+    """Test that every pooled connection has the video database pragmas applied."""
+    with store.engine.connect() as conn:
+        pragmas = {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "foreign_keys", "temp_store", "mmap_size", "cache_size")
+        }
+
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "foreign_keys": 1,
+        "temp_store": 2,
+        "mmap_size": 268435456,
+        "cache_size": -16384,
+    }
+
+
+def test_update_video_uses_single_update_returning(client, store, record_statements):
+    """Test that updating a video writes and reads it back with one statement."""
+    video = _create_video(store, title="Original Title", description="Original description")
+
+    with record_statements() as statements:
+        updated = store.update_video(video.id, title="New Title", description=None, unknown="ignored")
+
+    assert updated.title == "New Title"
+    assert updated.description == "Original description"
+    assert updated.updated_at is not None
+    video_statements = [s for s in statements if "videos" in s]
+    assert len(video_statements) == 1
+    assert video_statements[0].startswith("UPDATE") and "RETURNING" in video_statements[0]
+
+    assert store.update_video(9999, title="Missing") is None
+    response = client.patch(f"/videos/{video.id}", json={})
+    assert response.status_code == 200
+    assert response.json()["title"] == "New Title"
+
+
+def test_playlist_videos_endpoint_reads_plain_rows(client, store):
+    """Test that playlist videos are rendered from Core rows with every response field."""
+    videos = [_create_video(store, i) for i in range(2)]
+    playlist = store.create_playlist(name="Ordered")
+    store.add_videos_to_playlist(playlist.id, [videos[1].id, videos[0].id])
+
+    rows = store.get_playlist_video_rows(playlist.id, ("id", "title"))
+    assert all(isinstance(row, Row) for row in rows)
+    assert [(row.id, row.title) for row in rows] == [(videos[1].id, "Video 1"), (videos[0].id, "Video 0")]
+
+    response = client.get(f"/playlists/{playlist.id}/videos")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data] == [videos[1].id, videos[0].id]
+    assert data[0]["video_url"] == "http://example.com/1.mp4"
+    assert data[0]["created_at"] is not None
+
+
+def test_bookmark_and_progress_lookups_bind_prebuilt_statements(store):
+    """Test that the prebuilt progress and bookmark statements bind per-call values."""
+    video = _create_video(store)
+    store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=90, note="later")
+    store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=30, note="earlier")
+    store.create_bookmark(user_id=2, video_id=video.id, timestamp_seconds=10)
+    store.update_progress(user_id=2, video_id=video.id, progress_seconds=15)
+
+    assert [b.timestamp_seconds for b in store.get_bookmarks(1, video.id)] == [30, 90]
+    assert [b.timestamp_seconds for b in store.get_bookmarks(2, video.id)] == [10]
+    assert store.get_progress(1, video.id) is None
+    assert store.get_progress(2, video.id).progress_seconds == 15
+
+
+def test_list_playlists_for_user_seeks_indexes_instead_of_scanning(store, record_statements):
+    """Test that a user's playlist listing seeks both branches by index and skips duplicates."""
+    store.create_playlist(name="Mine", user_id=1)
+    store.create_playlist(name="Theirs", user_id=2)
+    store.create_playlist(name="Official", is_official=True)
+    store.create_playlist(name="Mine and official", user_id=1, is_official=True)
+
+    assert sorted(p.name for p in store.list_playlists(user_id=1)) == ["Mine", "Mine and official", "Official"]
+
+    with record_statements() as statements:
+        rows = store.list_playlists_with_counts(user_id=1)
+
+    assert sorted(p.name for p, _ in rows) == ["Mine", "Mine and official", "Official"]
+    with store.engine.connect() as conn:
+        sql = statements[-1].replace("?", "1")
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "SCAN playlists" not in plan
+    assert "idx_playlist_official" in plan
+
+
+def test_creates_take_one_insert_returning_each(store, record_statements):
+    """Test that creates and playlist appends read generated columns back via RETURNING."""
+    with record_statements() as statements:
+        video = _create_video(store)
+        playlist = store.create_playlist(name="Playlist")
+        first = store.add_video_to_playlist(playlist.id, video.id)
+        second = store.add_video_to_playlist(playlist.id, video.id)
+        bookmark = store.create_bookmark(user_id=1, video_id=video.id, timestamp_seconds=5)
+
+    assert len(statements) == 5
+    assert all(s.startswith("INSERT") and "RETURNING" in s for s in statements)
+    assert video.created_at and playlist.created_at and bookmark.created_at
+    assert (first.position, second.position) == (0, 1)
+
+
+def test_bulk_progress_and_bookmarks_commit_once(store):
+    """Test that batched progress updates and bookmarks are written in one transaction each."""
+    videos = [_create_video(store, i) for i in range(3)]
+    store.update_progress(user_id=1, video_id=videos[0].id, progress_seconds=10)
+
+    commits = []
+
+    def record(conn):
+        commits.append(conn)
+
+    event.listen(store.engine, "commit", record)
+    try:
+        written = store.update_progresses(
+            [
+                {"user_id": 1, "video_id": videos[0].id, "progress_seconds": 120, "completed": True},
+                {"user_id": 1, "video_id": videos[1].id, "progress_seconds": 45},
+                {"user_id": 2, "video_id": videos[2].id, "progress_seconds": 5},
+            ]
+        )
+        created = store.create_bookmarks(
+            [
+                {"user_id": 1, "video_id": videos[0].id, "timestamp_seconds": 60, "note": "key point"},
+                {"user_id": 1, "video_id": videos[0].id, "timestamp_seconds": 15},
+            ]
+        )
+    finally:
+        event.remove(store.engine, "commit", record)
+
+    assert (written, created) == (3, 2)
+    assert len(commits) == 2
+    first = store.get_progress(1, videos[0].id)
+    assert (first.progress_seconds, first.completed) == (120, True)
+    assert store.get_progress(1, videos[1].id).completed is False
+    assert store.get_progress(2, videos[2].id).progress_seconds == 5
+    assert [(b.timestamp_seconds, b.note) for b in store.get_bookmarks(1, videos[0].id)] == [
+        (15, None),
+        (60, "key point"),
+    ]
+    assert store.update_progresses([]) == 0
+    assert store.create_bookmarks([]) == 0
+
+
+def test_get_video_is_cached_and_invalidated_by_writes(client, store, record_statements):
+    """Test that repeated video lookups skip the database until the video changes."""
+    video = _create_video(store, title="Original Title")
+
+    with record_statements() as statements:
+        store.get_video(video.id)
+        assert client.get(f"/videos/{video.id}").json()["title"] == "Original Title"
+    assert len(statements) == 1
+
+    store.update_video(video.id, title="New Title")
+    assert store.get_video(video.id).title == "New Title"
+
+    store.add_view_counts({video.id: 3})
+    assert store.get_video(video.id).view_count == 3
+
+    store.delete_video(video.id)
+    assert store.get_video(video.id) is None
+    assert client.get(f"/videos/{video.id}").status_code == 404
+
+
+def test_flush_during_cache_miss_does_not_cache_stale_row(store, monkeypatch):
+    """Test that a row read before a view-count flush is not cached after it."""
+    video = _create_video(store)
+    real_session = store._session
+
+    def session_flushing_after_read():
+        # Only the get_video miss is intercepted; the flush uses real sessions
+        monkeypatch.setattr(store, "_session", real_session)
+        session = real_session()
+        real_get = session.get
+
+        def get_then_flush(*args, **kwargs):
+            row = real_get(*args, **kwargs)
+            store.add_view_counts({video.id: 5})
+            return row
+
+        session.get = get_then_flush
+        return session
+
+    monkeypatch.setattr(store, "_session", session_flushing_after_read)
+    assert store.get_video(video.id).view_count == 0
+
+    # The pre-flush row was not cached, so the next read sees the flushed count
+    assert store.get_video(video.id).view_count == 5